@@ -3,6 +3,13 @@ import pickle
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 import os
+import sys
+
+# Make the CropSystem package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from CropSystem.config import Config
+from CropSystem.forest_engine import compile_forest, save_forest
+from CropSystem.model_registry import resolve_model_path
 
 df = pd.read_csv('Crop_recommendation.csv')
 
@@ -23,4 +30,9 @@ os.makedirs('CropSystem/ML', exist_ok=True)
 with open('CropSystem/ML/crop_model.pkl', 'wb') as f:
     pickle.dump(clf, f)
 
+# Save the flattened, memory-mappable artifact where the web workers' model registry watches for it
+artifact_path = resolve_model_path(Config.MODEL_ARTIFACT_PATH)
+save_forest(compile_forest(clf), artifact_path)
+
 print("✅ Model trained and saved to CropSystem/ML/crop_model.pkl")
+print(f"✅ Memory-mapped artifact saved to {artifact_path}/")
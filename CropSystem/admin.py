@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import UpstreamQuota, UpstreamResponse
+
+
+@admin.register(UpstreamResponse)
+class UpstreamResponseAdmin(admin.ModelAdmin):
+    list_display = ('namespace', 'key', 'fetched_at', 'fresh_until', 'stale_until')
+    list_filter = ('namespace',)
+    search_fields = ('key',)
+
+
+@admin.register(UpstreamQuota)
+class UpstreamQuotaAdmin(admin.ModelAdmin):
+    list_display = ('upstream', 'day', 'used')
+    list_filter = ('upstream',)
+    date_hierarchy = 'day'
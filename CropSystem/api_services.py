@@ -1,14 +1,79 @@
 import requests
+import asyncio
+import atexit
+import contextvars
+import functools
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from http.cookiejar import DefaultCookiePolicy
 import logging
+import threading
+import httpx
+from django.db import close_old_connections
+from requests.adapters import HTTPAdapter
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .cache import ResponseCache, normalize_coordinates, normalize_location
 from .config import Config
+from .crop_knowledge import crop_knowledge
+from .deadline import DeadlineExceeded, current_deadline, use_deadline
+from .gujarat_config import GUJARAT_APMC_MARKETS, GUJARAT_DISTRICT_COORDINATES, GUJARAT_REGIONS, GUJARAT_SAMPLE_WEATHER, GUJARAT_SOIL_SAMPLE_VALUES
+from .location_index import location_index
+from .quota import PREFETCH, USER, QuotaExceededError, UpstreamQuotaManager
+from .response_store import ResponseStore
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .spatial_index import gujarat_locator
 from .api_endpoints import SOIL_API_CONFIG, MANDI_API_CONFIG
 
 logger = logging.getLogger(__name__)
 
+def on_service_loop(method):
+    """Run an async APIService method on the service's own event loop, whichever loop awaits it
+    
+    Under WSGI every async view runs on a fresh event loop, which would get a
+    fresh HTTP client and its own request coalescing each time; the shared loop
+    keeps one pooled client and one set of in-flight calls for all requests.
+    The caller's request deadline is carried over.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        loop = self._service_loop()
+        if asyncio.get_running_loop() is loop:
+            return await method(self, *args, **kwargs)
+        
+        deadline = current_deadline()
+        async def run():
+            with use_deadline(deadline):
+                return await method(self, *args, **kwargs)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(run(), loop))
+    return wrapper
+
+class UpstreamError(Exception):
+    """Raised when an upstream API answers with an unusable response"""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def is_upstream_failure(error):
+    """Whether an error from an upstream call means the upstream is unhealthy
+    
+    Transport errors, timeouts, 5xx and 429 (rate limited) responses count
+    against the circuit breaker. Other 4xx answers, such as OpenWeather's 404
+    for a misspelled city, and unparseable bodies are the request's problem
+    and do not.
+    """
+    if isinstance(error, (requests.HTTPError, httpx.HTTPStatusError)):
+        status_code = error.response.status_code if error.response is not None else None
+    elif isinstance(error, UpstreamError):
+        status_code = error.status_code
+    elif isinstance(error, requests.exceptions.InvalidJSONError):
+        return False
+    else:
+        return isinstance(error, (requests.RequestException, httpx.TransportError, TimeoutError))
+    return status_code is None or status_code >= 500 or status_code == 429
+
 class APIService:
-    def __init__(self):
+    def __init__(self, cache=None, store=None, quota=None):
         # Load configuration
         self.config = Config()
         
@@ -18,314 +83,710 @@ class APIService:
         self.mandi_api_key = self.config.MANDI_API_KEY
         self.mandi_api_url = self.config.MANDI_API_URL
         
-    def get_weather_data(self, location):
-        """Fetch weather data from OpenWeatherMap API for Gujarat locations"""
+        # Response cache shared by all upstream calls (pluggable, see cache.py)
+        ttls = {
+            'weather': self.config.WEATHER_CACHE_TIMEOUT,
+            'geocoding': self.config.GEOCODE_CACHE_TIMEOUT,
+            'soil': self.config.SOIL_CACHE_TIMEOUT,
+            'mandi': self.config.MANDI_CACHE_TIMEOUT,
+        }
+        self.cache = cache or ResponseCache(ttls, maxsize=self.config.CACHE_MAX_ENTRIES)
+        
+        # Database-backed store behind the cache, shared by workers and surviving restarts
+        self.store = store or ResponseStore(
+            ttls, max_stale_age=self.config.STALE_RESPONSE_MAX_AGE, purge_every=self.config.STORE_PURGE_EVERY
+        )
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        
+        # Identical concurrent upstream lookups (same namespace and cache key) share one request
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+        
+        # Event loop thread and pooled HTTP client for the async methods, started on first use
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self._client = None
+        
+        # Pooled keep-alive sessions, one per upstream so pools are sized independently
+        self.sessions = {
+            'openweather': self._build_session(),
+            'soil': self._build_session(),
+            'mandi': self._build_session(),
+        }
+        
+        # Circuit breakers per upstream; weather and geocoding share the OpenWeather breaker
+        openweather_breaker = self._build_breaker('openweather')
+        self.breakers = {
+            'weather': openweather_breaker,
+            'geocoding': openweather_breaker,
+            'soil': self._build_breaker('soil'),
+            'mandi': self._build_breaker('mandi'),
+        }
+        
+        # Per-second and daily call quotas per upstream, keyed like the breakers' names
+        self.quota = quota or UpstreamQuotaManager(
+            {
+                'openweather': (self.config.OPENWEATHER_RATE_LIMIT, self.config.OPENWEATHER_DAILY_QUOTA),
+                'soil': (self.config.SOIL_RATE_LIMIT, self.config.SOIL_DAILY_QUOTA),
+                'mandi': (self.config.MANDI_RATE_LIMIT, self.config.MANDI_DAILY_QUOTA),
+            },
+            burst=self.config.UPSTREAM_BURST,
+            user_reserve=self.config.QUOTA_USER_RESERVE
+        )
+        
+        # Worker threads for issuing independent upstream calls concurrently
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.UPSTREAM_WORKERS, thread_name_prefix='upstream'
+        )
+        
+        # Separate threads for the async methods' database calls, so they never queue behind
+        # bulk lookups and background refreshes blocked on upstream HTTP in the pool above
+        self.db_executor = ThreadPoolExecutor(
+            max_workers=self.config.DB_WORKERS, thread_name_prefix='upstream-db'
+        )
+        
+    def _build_session(self):
+        """Create a requests session with a tuned connection pool"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=self.config.HTTP_POOL_MAXSIZE,
+            max_retries=self.config.HTTP_MAX_RETRIES
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # Refuse cookies so a session shared between threads carries no mutable state
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+    
+    def _build_breaker(self, name):
+        return CircuitBreaker(
+            name,
+            failure_threshold=self.config.CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=self.config.CIRCUIT_RECOVERY_TIMEOUT,
+            is_failure=is_upstream_failure
+        )
+    
+    def _get(self, request):
+        """Issue an (upstream, url, kwargs) request on the upstream's pooled session"""
+        upstream, url, kwargs = self._within_deadline(request)
+        return self.sessions[upstream].get(url, **kwargs)
+    
+    async def _aget(self, request):
+        """Issue an (upstream, url, kwargs) request on the service loop's pooled async client"""
+        upstream, url, kwargs = self._within_deadline(request)
+        return await self._async_client().get(url, **kwargs)
+    
+    def _within_deadline(self, request):
+        """Cut the request's timeout to the time left before the current request deadline"""
+        deadline = current_deadline()
+        if deadline is None:
+            return request
+        upstream, url, kwargs = request
+        return upstream, url, dict(kwargs, timeout=deadline.timeout(kwargs['timeout']))
+    
+    def _service_loop(self):
+        """The long-lived event loop all async upstream work runs on, started on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name='upstream-loop', daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+    
+    def _async_client(self):
+        """The pooled httpx client; only used from the service loop, which owns it"""
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.config.ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=self.config.HTTP_POOL_MAXSIZE
+            )
+            self._client = httpx.AsyncClient(limits=limits)
+        return self._client
+    
+    async def _run_sync(self, func, *args):
+        """Await a blocking call (database access) on the database worker pool"""
+        return await asyncio.wrap_future(self._submit(func, *args, executor=self.db_executor))
+    
+    def upstream_status(self):
+        """Report circuit breaker state and quota usage for every upstream API"""
+        return {
+            breaker.name: dict(breaker.stats(), quota=self.quota.stats(breaker.name))
+            for breaker in set(self.breakers.values())
+        }
+    
+    def close(self):
+        """Close all pooled upstream connections, the service loop and worker threads"""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            if self._client is not None:
+                try:
+                    asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(timeout=5)
+                except Exception as e:
+                    logger.warning(f"Could not close the async HTTP client: {e}")
+                self._client = None
+            loop.call_soon_threadsafe(loop.stop)
+            self._loop_thread.join(timeout=5)
+            if not loop.is_running():
+                loop.close()
+        self.executor.shutdown(wait=False)
+        self.db_executor.shutdown(wait=False)
+        for session in self.sessions.values():
+            session.close()
+    
+    def _cached_call(self, namespace, key, fetch, fallback):
+        """Serve from cache or the persisted store, otherwise fetch through the upstream's circuit breaker
+        
+        Stale persisted responses are returned immediately while a background
+        refresh runs. Fallbacks (upstream errors, an open circuit, an
+        exhausted quota or no time left before the request deadline) are never cached.
+        """
+        cached = self.cache.get(namespace, key)
+        if cached is not None:
+            return cached
+        return self._cache_miss(namespace, key, fetch, fallback)
+    
+    def _cache_miss(self, namespace, key, fetch, fallback):
+        """_cached_call past the memory cache: serve from the persisted store, else fetch upstream"""
+        stored = self.store.get(namespace, key)
+        if stored is not None:
+            if stored.fresh_for > 0:
+                self.cache.set(namespace, key, stored.value, ttl=stored.fresh_for)
+            else:
+                self._refresh_in_background(namespace, key, fetch)
+            return stored.value
+        
         try:
-            if self.weather_api_key == 'YOUR_OPENWEATHER_API_KEY':
-                logger.warning("OpenWeatherMap API key not configured")
-                return self._get_gujarat_sample_weather_data(location)
-                
-            url = f"http://api.openweathermap.org/data/2.5/weather"
-            params = {
-                'q': f"{location},IN",  # India
-                'appid': self.weather_api_key,
-                'units': 'metric'
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Get rainfall data - try multiple sources
-            rainfall = 0
-            if 'rain' in data and '1h' in data['rain']:
-                rainfall = data['rain']['1h']
-            elif 'rain' in data and '3h' in data['rain']:
-                rainfall = data['rain']['3h']
-            elif 'rain' in data and '24h' in data['rain']:
-                rainfall = data['rain']['24h']
-            
-            # If no rain data, check if it's currently raining
-            if rainfall == 0 and 'weather' in data:
-                weather_desc = data['weather'][0]['description'].lower()
-                if any(word in weather_desc for word in ['rain', 'drizzle', 'shower']):
-                    rainfall = 0.5  # Light rain if weather description indicates rain
-            
-            return {
-                'temperature': data['main']['temp'],
-                'humidity': data['main']['humidity'],
-                'rainfall': rainfall,
-                'description': data['weather'][0]['description']
-            }
+            result = self._fetch_once(namespace, key, fetch)
+        except (CircuitOpenError, QuotaExceededError, DeadlineExceeded) as e:
+            logger.debug(f"{e}, serving fallback {namespace} data")
+            return fallback()
         except Exception as e:
-            logger.error(f"Error fetching weather data: {e}")
-            return self._get_gujarat_sample_weather_data(location)
+            logger.error(f"Error fetching {namespace} data: {e}")
+            return fallback()
+        return result
     
-    def get_soil_data(self, lat, lon):
-        """Fetch soil data using the user's soil API key"""
+    def _fetch_once(self, namespace, key, fetch, priority=USER):
+        """Fetch through the upstream's quota and breaker and remember the result
+        
+        Identical concurrent calls (same namespace and cache key) wait for the
+        one already in flight, for no longer than the current request deadline
+        allows, and share its result or exception.
+        """
+        def fetch_and_remember():
+            self._check_deadline()
+            result = self.admit(namespace, priority).run(fetch)
+            if result is not None:
+                self.cache.set(namespace, key, result)
+                self.store.set(namespace, key, result)
+            return result
+        
+        deadline = current_deadline()
         try:
-            # Use the user's soil API with the provided key
-            soil_api_endpoint = f"{SOIL_API_CONFIG['base_url']}{SOIL_API_CONFIG['endpoint']}"
-            
-            headers = {
-                'Authorization': f"{SOIL_API_CONFIG['auth_type']} {self.soil_api_key}",
-                'Content-Type': 'application/json'
-            }
-            
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'format': 'json'
-            }
-            
-            logger.info(f"Fetching soil data from: {soil_api_endpoint}")
-            response = requests.get(soil_api_endpoint, headers=headers, params=params, timeout=15)
-            
-            if response.status_code == 200:
-                data = response.json()
-                soil_data = {
-                    'N': data.get('nitrogen', 75.0),
-                    'P': data.get('phosphorus', 35.0),
-                    'K': data.get('potassium', 180.0),
-                    'ph': data.get('ph', 7.2),
-                    'organic_carbon': data.get('organic_carbon', 37.5),
-                    'soil_type': data.get('soil_type', 'Gujarat soil'),
-                    'source': 'Real API'
-                }
-                logger.info("Successfully fetched soil data from API")
-                return soil_data
+            return self.flights.do(
+                (namespace, key), fetch_and_remember, wait_timeout=deadline.remaining() if deadline else None
+            )
+        except TimeoutError:
+            raise DeadlineExceeded(f"Request deadline passed waiting for {namespace} data")
+    
+    def admit(self, namespace, priority=USER, wait=False):
+        """Admit one call to the namespace's upstream and return its breaker, to run() the call through
+        
+        The breaker is asked before any quota is spent, so calls refused by an
+        open circuit cost nothing; a half-open probe refused by the quota is
+        handed back for the next caller.
+        """
+        breaker = self.breakers[namespace]
+        breaker.admit()
+        try:
+            self.quota.acquire(breaker.name, priority, wait=wait)
+        except BaseException:
+            breaker.release()
+            raise
+        return breaker
+    
+    def _check_deadline(self):
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.check()
+    
+    async def _acached_call(self, namespace, key, afetch, fallback, fetch):
+        """Async _cached_call: afetch is awaited on a miss, fetch is the sync fetcher used for background refreshes"""
+        cached = self.cache.get(namespace, key)
+        if cached is not None:
+            return cached
+        
+        stored = await self._run_sync(self.store.get, namespace, key)
+        if stored is not None:
+            if stored.fresh_for > 0:
+                self.cache.set(namespace, key, stored.value, ttl=stored.fresh_for)
             else:
-                logger.warning(f"Soil API returned status {response.status_code}")
-                # Return sample data as fallback
-                return self._get_gujarat_sample_soil_data(lat, lon)
-                
+                self._refresh_in_background(namespace, key, fetch)
+            return stored.value
+        
+        async def fetch_and_remember():
+            self._check_deadline()
+            breaker = self.breakers[namespace]
+            breaker.admit()
+            try:
+                await self._run_sync(self.quota.acquire, breaker.name, USER)
+            except BaseException:
+                breaker.release()
+                raise
+            result = await breaker.run_async(afetch)
+            if result is not None:
+                self.cache.set(namespace, key, result)
+                await self._run_sync(self.store.set, namespace, key, result)
+            return result
+        
+        deadline = current_deadline()
+        try:
+            # The shared flight keeps running for other callers if this one's deadline passes
+            return await asyncio.wait_for(
+                self.async_flights.do((namespace, key), fetch_and_remember),
+                deadline.remaining() if deadline else None
+            )
+        except TimeoutError:
+            logger.debug(f"Request deadline passed waiting for {namespace} data, serving fallback")
+            return fallback()
+        except (CircuitOpenError, QuotaExceededError, DeadlineExceeded) as e:
+            logger.debug(f"{e}, serving fallback {namespace} data")
+            return fallback()
         except Exception as e:
-            logger.error(f"Error fetching soil data: {e}")
-            # Return sample data as fallback
-            return self._get_gujarat_sample_soil_data(lat, lon)
+            logger.error(f"Error fetching {namespace} data: {e}")
+            return fallback()
+    
+    def _refresh_in_background(self, namespace, key, fetch):
+        """Re-fetch a stale entry on the worker pool, at most once per key at a time"""
+        with self._refresh_lock:
+            if (namespace, key) in self._refreshing:
+                return
+            self._refreshing.add((namespace, key))
+        
+        def refresh():
+            try:
+                # Nobody is waiting on a refresh, so the triggering request's deadline does not apply
+                with use_deadline(None):
+                    self._fetch_once(namespace, key, fetch, priority=PREFETCH)
+            except Exception as e:
+                logger.warning(f"Background refresh of {namespace} data failed: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard((namespace, key))
+        
+        self._submit(refresh)
+    
+    def _submit(self, func, *args, executor=None):
+        """Run func on the worker pool (or executor), releasing the worker's database connection afterwards
+        
+        func runs in a copy of the caller's context, so under the same request deadline.
+        """
+        def run():
+            try:
+                return func(*args)
+            finally:
+                close_old_connections()
+        
+        return (executor or self.executor).submit(contextvars.copy_context().run, run)
+    
+    def freshness(self, namespace, *args):
+        """Seconds the cached response for these call arguments stays fresh (0 if not cached, e.g. fallback data)
+        
+        Takes the same arguments as the matching get_* method, e.g.
+        freshness('mandi', 'wheat') or freshness('soil', lat, lon).
+        """
+        key_functions = {
+            'weather': self._location_key,
+            'geocoding': self._location_key,
+            'soil': self._soil_key,
+            'mandi': self._mandi_key,
+        }
+        remaining = self.cache.expires_in(namespace, key_functions[namespace](*args))
+        return self.config.GEOCODE_CACHE_TIMEOUT if remaining is None else remaining
+    
+    def _location_key(self, location):
+        """Cache key for a location: the Gujarat place it names exactly if any, else the normalized text
+        
+        Upstream is queried with the caller's text, so only exact matches may share
+        a place's key; 'Rajkott' or 'Surat road, Rajkot' keep keys of their own.
+        """
+        place = location_index.exact(location)
+        return normalize_location(place.name) if place else normalize_location(location)
+    
+    def get_weather_data(self, location):
+        """Fetch weather data from OpenWeatherMap API for Gujarat locations"""
+        if self.weather_api_key == 'YOUR_OPENWEATHER_API_KEY':
+            logger.warning("OpenWeatherMap API key not configured")
+            return self._get_gujarat_sample_weather_data(location)
+        
+        return self._cached_call(
+            'weather', self._location_key(location),
+            lambda: self._fetch_weather_data(location),
+            lambda: self._get_gujarat_sample_weather_data(location)
+        )
+    
+    @on_service_loop
+    async def aget_weather_data(self, location):
+        """Async get_weather_data for the async views"""
+        if self.weather_api_key == 'YOUR_OPENWEATHER_API_KEY':
+            logger.warning("OpenWeatherMap API key not configured")
+            return self._get_gujarat_sample_weather_data(location)
+        
+        return await self._acached_call(
+            'weather', self._location_key(location),
+            lambda: self._afetch_weather_data(location),
+            lambda: self._get_gujarat_sample_weather_data(location),
+            lambda: self._fetch_weather_data(location)
+        )
+    
+    def _fetch_weather_data(self, location):
+        return self._parse_weather_data(self._get(self._weather_request(location)))
+    
+    async def _afetch_weather_data(self, location):
+        return self._parse_weather_data(await self._aget(self._weather_request(location)))
+    
+    def _weather_request(self, location):
+        url = f"http://api.openweathermap.org/data/2.5/weather"
+        params = {
+            'q': f"{location},IN",  # India
+            'appid': self.weather_api_key,
+            'units': 'metric'
+        }
+        return 'openweather', url, {'params': params, 'timeout': 10}
+    
+    def _parse_weather_data(self, response):
+        response.raise_for_status()
+        data = response.json()
+        
+        # Get rainfall data - try multiple sources
+        rainfall = 0
+        if 'rain' in data and '1h' in data['rain']:
+            rainfall = data['rain']['1h']
+        elif 'rain' in data and '3h' in data['rain']:
+            rainfall = data['rain']['3h']
+        elif 'rain' in data and '24h' in data['rain']:
+            rainfall = data['rain']['24h']
+        
+        # If no rain data, check if it's currently raining
+        if rainfall == 0 and 'weather' in data:
+            weather_desc = data['weather'][0]['description'].lower()
+            if any(word in weather_desc for word in ['rain', 'drizzle', 'shower']):
+                rainfall = 0.5  # Light rain if weather description indicates rain
+        
+        return {
+            'temperature': data['main']['temp'],
+            'humidity': data['main']['humidity'],
+            'rainfall': rainfall,
+            'description': data['weather'][0]['description']
+        }
+    
+    def get_soil_data(self, lat, lon):
+        """Fetch soil data using the user's soil API key"""
+        return self._cached_call(
+            'soil', self._soil_key(lat, lon),
+            lambda: self._fetch_soil_data(lat, lon),
+            lambda: self._get_gujarat_sample_soil_data(lat, lon)
+        )
+    
+    def _soil_key(self, lat, lon):
+        return normalize_coordinates(lat, lon, self.config.COORDINATE_CACHE_PRECISION)
+    
+    @on_service_loop
+    async def aget_soil_data(self, lat, lon):
+        """Async get_soil_data for the async views"""
+        return await self._acached_call(
+            'soil', self._soil_key(lat, lon),
+            lambda: self._afetch_soil_data(lat, lon),
+            lambda: self._get_gujarat_sample_soil_data(lat, lon),
+            lambda: self._fetch_soil_data(lat, lon)
+        )
+    
+    def _fetch_soil_data(self, lat, lon):
+        return self._parse_soil_data(self._get(self._soil_request(lat, lon)))
+    
+    async def _afetch_soil_data(self, lat, lon):
+        return self._parse_soil_data(await self._aget(self._soil_request(lat, lon)))
+    
+    def _soil_request(self, lat, lon):
+        # Use the user's soil API with the provided key
+        soil_api_endpoint = f"{SOIL_API_CONFIG['base_url']}{SOIL_API_CONFIG['endpoint']}"
+        
+        headers = {
+            'Authorization': f"{SOIL_API_CONFIG['auth_type']} {self.soil_api_key}",
+            'Content-Type': 'application/json'
+        }
+        
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'format': 'json'
+        }
+        
+        logger.info(f"Fetching soil data from: {soil_api_endpoint}")
+        return 'soil', soil_api_endpoint, {'headers': headers, 'params': params, 'timeout': 15}
+    
+    def _parse_soil_data(self, response):
+        if response.status_code != 200:
+            raise UpstreamError(f"Soil API returned status {response.status_code}", response.status_code)
+        
+        data = response.json()
+        soil_data = {
+            'N': data.get('nitrogen', 75.0),
+            'P': data.get('phosphorus', 35.0),
+            'K': data.get('potassium', 180.0),
+            'ph': data.get('ph', 7.2),
+            'organic_carbon': data.get('organic_carbon', 37.5),
+            'soil_type': data.get('soil_type', 'Gujarat soil'),
+            'source': 'Real API'
+        }
+        logger.info("Successfully fetched soil data from API")
+        return soil_data
     
     def get_location_coordinates(self, location):
-        """Get coordinates for Gujarat locations"""
-        try:
-            if self.weather_api_key == 'YOUR_OPENWEATHER_API_KEY':
-                logger.warning("OpenWeatherMap API key not configured")
-                return self._get_gujarat_coordinates(location)
-                
-            url = f"http://api.openweathermap.org/geo/1.0/direct"
-            params = {
-                'q': f"{location},IN",
-                'limit': 1,
-                'appid': self.weather_api_key
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data:
-                return {
-                    'lat': data[0]['lat'],
-                    'lon': data[0]['lon']
-                }
-            return None
-        except Exception as e:
-            logger.error(f"Error fetching coordinates: {e}")
+        """Get coordinates for Gujarat locations, from the local gazetteer when possible"""
+        # Place coordinates never change, so a query naming a known place skips the network entirely;
+        # partial, prefix and typo matches are left to the upstream geocoder, which knows far more places
+        place = location_index.exact(location)
+        if place:
+            return {'lat': place.lat, 'lon': place.lon}
+        
+        if self.weather_api_key == 'YOUR_OPENWEATHER_API_KEY':
+            logger.warning("OpenWeatherMap API key not configured")
             return self._get_gujarat_coordinates(location)
+        
+        return self._cached_call(
+            'geocoding', self._location_key(location),
+            lambda: self._geocode_and_remember(location),
+            lambda: self._get_gujarat_coordinates(location)
+        )
     
-    def get_mandi_prices(self, crop_name):
-        """Fetch mandi prices using the user's mandi API key"""
-        try:
-            # Use the user's mandi API with the provided key
-            mandi_api_endpoint = f"{MANDI_API_CONFIG['base_url']}{MANDI_API_CONFIG['endpoint']}"
-            
-            headers = {
-                'Authorization': f"{MANDI_API_CONFIG['auth_type']} {self.mandi_api_key}",
-                'Content-Type': 'application/json'
-            }
-            
-            params = {
-                'crop': crop_name.lower(),
-                'region': 'gujarat'
+    @on_service_loop
+    async def aget_location_coordinates(self, location):
+        """Async get_location_coordinates for the async views"""
+        place = location_index.exact(location)
+        if place:
+            return {'lat': place.lat, 'lon': place.lon}
+        
+        if self.weather_api_key == 'YOUR_OPENWEATHER_API_KEY':
+            logger.warning("OpenWeatherMap API key not configured")
+            return self._get_gujarat_coordinates(location)
+        
+        async def geocode_and_remember():
+            place = await self._afetch_location_coordinates(location)
+            await self._run_sync(self._remember_place, place)
+            return self._coordinates(place)
+        
+        return await self._acached_call(
+            'geocoding', self._location_key(location),
+            geocode_and_remember,
+            lambda: self._get_gujarat_coordinates(location),
+            lambda: self._geocode_and_remember(location)
+        )
+    
+    def _geocode_and_remember(self, location):
+        """Geocode upstream and write Gujarat hits back to the gazetteer"""
+        place = self._fetch_location_coordinates(location)
+        self._remember_place(place)
+        return self._coordinates(place)
+    
+    def _remember_place(self, place):
+        """Add a geocoded place to the gazetteer under the geocoder's own name, if it is in Gujarat
+        
+        The state reported by the geocoder decides: being near a Gujarat district
+        is not enough (Udaipur is), and the caller's text is never stored.
+        """
+        if not place or place.get('state') != 'Gujarat' or not place.get('name'):
+            return
+        district = gujarat_locator.nearest_district(place['lat'], place['lon'])['district']
+        location_index.remember(place['name'], district, place['lat'], place['lon'])
+    
+    def _coordinates(self, place):
+        return {'lat': place['lat'], 'lon': place['lon']} if place else None
+    
+    def _fetch_location_coordinates(self, location):
+        return self._parse_location_coordinates(self._get(self._geocoding_request(location)))
+    
+    async def _afetch_location_coordinates(self, location):
+        return self._parse_location_coordinates(await self._aget(self._geocoding_request(location)))
+    
+    def _geocoding_request(self, location):
+        url = f"http://api.openweathermap.org/geo/1.0/direct"
+        params = {
+            'q': f"{location},IN",
+            'limit': 1,
+            'appid': self.weather_api_key
+        }
+        return 'openweather', url, {'params': params, 'timeout': 10}
+    
+    def _parse_location_coordinates(self, response):
+        """The geocoder's best match as {'name', 'state', 'lat', 'lon'}, or None"""
+        response.raise_for_status()
+        data = response.json()
+        
+        if data:
+            return {
+                'name': data[0].get('name'),
+                'state': data[0].get('state'),
+                'lat': data[0]['lat'],
+                'lon': data[0]['lon']
             }
-            
-            logger.info(f"Fetching mandi prices from: {mandi_api_endpoint}")
-            response = requests.get(mandi_api_endpoint, headers=headers, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                result = {
-                    'crop': crop_name,
-                    'price_per_quintal': data.get('price', 2500),
-                    'market': data.get('market', 'Gujarat APMC Market'),
-                    'date': data.get('date', datetime.now().strftime('%Y-%m-%d')),
-                    'region': 'Gujarat, India',
-                    'notes': 'Real-time data from API',
-                    'source': 'Real API'
-                }
-                logger.info(f"Successfully fetched mandi prices for {crop_name}")
-                return result
-            else:
-                logger.warning(f"Mandi API returned status {response.status_code}")
-                # Return sample data as fallback
-                return self._get_gujarat_mandi_prices(crop_name)
-                
-        except Exception as e:
-            logger.error(f"Error fetching mandi prices: {e}")
-            # Return sample data as fallback
-            return self._get_gujarat_mandi_prices(crop_name)
+        return None
+    
+    def get_mandi_prices(self, crop_name, market=None):
+        """Fetch mandi prices using the user's mandi API key, optionally for one APMC market"""
+        return self._cached_call(
+            'mandi', self._mandi_key(crop_name, market),
+            lambda: self._fetch_mandi_prices(crop_name, market),
+            lambda: self._get_gujarat_mandi_prices(crop_name, market)
+        )
+    
+    @on_service_loop
+    async def aget_mandi_prices(self, crop_name, market=None):
+        """Async get_mandi_prices for the async views"""
+        return await self._acached_call(
+            'mandi', self._mandi_key(crop_name, market),
+            lambda: self._afetch_mandi_prices(crop_name, market),
+            lambda: self._get_gujarat_mandi_prices(crop_name, market),
+            lambda: self._fetch_mandi_prices(crop_name, market)
+        )
+    
+    def _mandi_key(self, crop_name, market=None):
+        crop_key = normalize_location(crop_name)
+        return (crop_key, market) if market else crop_key
+    
+    def resolve_market(self, market):
+        """Return the GUJARAT_APMC_MARKETS key for a key or market name such as 'APMC Rajkot'"""
+        key = normalize_location(market)
+        if key in GUJARAT_APMC_MARKETS:
+            return key
+        for market_key, info in GUJARAT_APMC_MARKETS.items():
+            if normalize_location(info['name']) == key:
+                return market_key
+        raise ValueError(f"Unknown APMC market: {market}")
+    
+    def get_bulk_mandi_prices(self, crops, markets=None):
+        """Fetch mandi prices for many crops (and optionally markets) in one call
+        
+        Crops and markets are deduplicated, cached entries are returned directly
+        and the remaining lookups run concurrently on the worker pool. Returns one
+        price dict per distinct (crop, market) pair: crops in order of first
+        appearance, each followed through the markets in order.
+        """
+        unique_crops = {}
+        for crop in crops:
+            unique_crops.setdefault(normalize_location(crop), str(crop).strip())
+        market_keys = list(dict.fromkeys(self.resolve_market(market) for market in markets or []))
+        
+        pairs = [(crop, market) for crop in unique_crops.values() for market in market_keys or [None]]
+        results = [self.cache.get('mandi', self._mandi_key(crop, market)) for crop, market in pairs]
+        # Misses skip the memory cache, which was just checked, and go straight to the store or upstream
+        futures = {
+            index: self._submit(
+                self._cache_miss, 'mandi', self._mandi_key(crop, market),
+                lambda crop=crop, market=market: self._fetch_mandi_prices(crop, market),
+                lambda crop=crop, market=market: self._get_gujarat_mandi_prices(crop, market)
+            )
+            for index, ((crop, market), cached) in enumerate(zip(pairs, results))
+            if cached is None
+        }
+        for index, future in futures.items():
+            results[index] = future.result()
+        return results
+    
+    def _fetch_mandi_prices(self, crop_name, market=None):
+        response = self._get(self._mandi_request(crop_name, market))
+        return self._parse_mandi_prices(response, crop_name, market)
+    
+    async def _afetch_mandi_prices(self, crop_name, market=None):
+        response = await self._aget(self._mandi_request(crop_name, market))
+        return self._parse_mandi_prices(response, crop_name, market)
+    
+    def _mandi_request(self, crop_name, market=None):
+        # Use the user's mandi API with the provided key
+        mandi_api_endpoint = f"{MANDI_API_CONFIG['base_url']}{MANDI_API_CONFIG['endpoint']}"
+        
+        headers = {
+            'Authorization': f"{MANDI_API_CONFIG['auth_type']} {self.mandi_api_key}",
+            'Content-Type': 'application/json'
+        }
+        
+        params = {
+            'crop': crop_name.lower(),
+            'region': 'gujarat'
+        }
+        if market:
+            params['market'] = GUJARAT_APMC_MARKETS[market]['name']
+        
+        logger.info(f"Fetching mandi prices from: {mandi_api_endpoint}")
+        return 'mandi', mandi_api_endpoint, {'headers': headers, 'params': params, 'timeout': 10}
+    
+    def _parse_mandi_prices(self, response, crop_name, market=None):
+        if response.status_code != 200:
+            raise UpstreamError(f"Mandi API returned status {response.status_code}", response.status_code)
+        
+        data = response.json()
+        result = {
+            'crop': crop_name,
+            'price_per_quintal': data.get('price', 2500),
+            'market': data.get('market', GUJARAT_APMC_MARKETS[market]['name'] if market else 'Gujarat APMC Market'),
+            'date': data.get('date', datetime.now().strftime('%Y-%m-%d')),
+            'region': 'Gujarat, India',
+            'notes': 'Real-time data from API',
+            'source': 'Real API'
+        }
+        logger.info(f"Successfully fetched mandi prices for {crop_name}")
+        return result
+    
+    def prefetch_targets(self, crops=None):
+        """(namespace, key, fetch) for the weather of every district and the mandi price of every crop"""
+        targets = []
+        if self.weather_api_key != 'YOUR_OPENWEATHER_API_KEY':
+            for district in GUJARAT_DISTRICT_COORDINATES:
+                targets.append((
+                    'weather', self._location_key(district),
+                    lambda district=district: self._fetch_weather_data(district)
+                ))
+        for crop in crops or crop_knowledge.names:
+            targets.append((
+                'mandi', normalize_location(crop),
+                lambda crop=crop: self._fetch_mandi_prices(crop)
+            ))
+        return targets
+    
+    @on_service_loop
+    async def aget_location_data(self, location, weather=True, soil=True):
+        """Fetch weather, coordinates and soil data for a location concurrently
+        
+        Weather and the geocoding -> soil chain run side by side on the service
+        loop, so the wait is the slower of the two chains rather than the sum of
+        all three calls. Returns a (weather, coordinates, soil) tuple.
+        Pass weather=False or soil=False to skip lookups the caller already has
+        values for; skipped parts come back as None.
+        """
+        async def no_weather():
+            return None
+        
+        async def coordinates_and_soil():
+            coords = await self.aget_location_coordinates(location)
+            soil_data = None
+            if coords and soil:
+                soil_data = await self.aget_soil_data(coords['lat'], coords['lon'])
+            return coords, soil_data
+        
+        weather_data, (coords, soil_data) = await asyncio.gather(
+            self.aget_weather_data(location) if weather else no_weather(), coordinates_and_soil()
+        )
+        return weather_data, coords, soil_data
     
     def get_planting_harvest_times(self, crop_name, location):
         """Get optimal planting and harvest times for Gujarat"""
         try:
-            # Gujarat-specific crop calendar based on local agricultural practices
-            gujarat_crop_calendar = {
-                'cotton': {
-                    'planting_start': 'May',
-                    'planting_end': 'June',
-                    'harvest_start': 'October',
-                    'harvest_end': 'November',
-                    'gujarat_notes': 'Major crop in Saurashtra and North Gujarat'
-                },
-                'groundnut': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Important oilseed crop in Saurashtra'
-                },
-                'wheat': {
-                    'planting_start': 'November',
-                    'planting_end': 'December',
-                    'harvest_start': 'March',
-                    'harvest_end': 'April',
-                    'gujarat_notes': 'Rabi crop in North and Central Gujarat'
-                },
-                'rice': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'October',
-                    'harvest_end': 'November',
-                    'gujarat_notes': 'Kharif crop in South Gujarat'
-                },
-                'maize': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Popular in Central Gujarat'
-                },
-                'sugarcane': {
-                    'planting_start': 'February',
-                    'planting_end': 'March',
-                    'harvest_start': 'December',
-                    'harvest_end': 'March',
-                    'gujarat_notes': 'Major crop in South Gujarat'
-                },
-                'pulses': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Various pulses grown across Gujarat'
-                },
-                'oilseeds': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Sesame, mustard, and other oilseeds'
-                },
-                'vegetables': {
-                    'planting_start': 'Year-round',
-                    'planting_end': 'Year-round',
-                    'harvest_start': 'Year-round',
-                    'harvest_end': 'Year-round',
-                    'gujarat_notes': 'Tomatoes, onions, potatoes, etc.'
-                },
-                'muskmelon': {
-                    'planting_start': 'February',
-                    'planting_end': 'March',
-                    'harvest_start': 'May',
-                    'harvest_end': 'June',
-                    'gujarat_notes': 'Summer fruit crop, popular in North and Central Gujarat'
-                },
-                'watermelon': {
-                    'planting_start': 'January',
-                    'planting_end': 'February',
-                    'harvest_start': 'April',
-                    'harvest_end': 'May',
-                    'gujarat_notes': 'Summer fruit crop, grown across Gujarat'
-                },
-                'cucumber': {
-                    'planting_start': 'February',
-                    'planting_end': 'March',
-                    'harvest_start': 'April',
-                    'harvest_end': 'May',
-                    'gujarat_notes': 'Summer vegetable crop'
-                },
-                'tomato': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Kharif vegetable crop, also grown in winter'
-                },
-                'onion': {
-                    'planting_start': 'May',
-                    'planting_end': 'June',
-                    'harvest_start': 'August',
-                    'harvest_end': 'September',
-                    'gujarat_notes': 'Important vegetable crop in Gujarat'
-                },
-                'potato': {
-                    'planting_start': 'October',
-                    'planting_end': 'November',
-                    'harvest_start': 'January',
-                    'harvest_end': 'February',
-                    'gujarat_notes': 'Rabi vegetable crop'
-                },
-                'chilli': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Spice crop, popular in Saurashtra'
-                },
-                'sesame': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Oilseed crop, major in Saurashtra'
-                },
-                'mustard': {
-                    'planting_start': 'October',
-                    'planting_end': 'November',
-                    'harvest_start': 'February',
-                    'harvest_end': 'March',
-                    'gujarat_notes': 'Rabi oilseed crop'
-                },
-                'bajra': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Millet crop, drought-resistant'
-                },
-                'jowar': {
-                    'planting_start': 'June',
-                    'planting_end': 'July',
-                    'harvest_start': 'September',
-                    'harvest_end': 'October',
-                    'gujarat_notes': 'Sorghum crop, grown in dry areas'
-                }
-            }
-            
-            return gujarat_crop_calendar.get(crop_name.lower(), {
-                'planting_start': 'Varies by region',
-                'planting_end': 'Varies by region',
-                'harvest_start': 'Varies by region',
-                'harvest_end': 'Varies by region',
-                'gujarat_notes': 'Check with local agricultural extension office'
-            })
+            return crop_knowledge.calendar(crop_name)
         except Exception as e:
             logger.error(f"Error getting planting/harvest times: {e}")
             return None
@@ -333,27 +794,28 @@ class APIService:
     # Gujarat-specific sample data methods
     def _get_gujarat_sample_weather_data(self, location):
         """Return sample weather data for Gujarat cities"""
-        gujarat_weather = {
-            'ahmedabad': {'temperature': 32.5, 'humidity': 45.0, 'rainfall': 0.0, 'description': 'sunny'},
-            'surat': {'temperature': 30.2, 'humidity': 65.0, 'rainfall': 2.5, 'description': 'partly cloudy'},
-            'vadodara': {'temperature': 31.8, 'humidity': 50.0, 'rainfall': 0.0, 'description': 'clear sky'},
-            'rajkot': {'temperature': 33.1, 'humidity': 40.0, 'rainfall': 0.0, 'description': 'sunny'},
-            'bhavnagar': {'temperature': 29.5, 'humidity': 70.0, 'rainfall': 5.0, 'description': 'light rain'},
-            'jamnagar': {'temperature': 32.0, 'humidity': 55.0, 'rainfall': 0.0, 'description': 'clear sky'},
-            'anand': {'temperature': 30.5, 'humidity': 60.0, 'rainfall': 1.0, 'description': 'partly cloudy'},
-            'mehsana': {'temperature': 34.2, 'humidity': 35.0, 'rainfall': 0.0, 'description': 'sunny'}
-        }
-        
-        location_lower = location.lower()
-        for city, weather in gujarat_weather.items():
-            if city in location_lower:
-                return weather
+        place = location_index.resolve(location)
+        if place:
+            for name in (place.name, place.district):
+                weather = GUJARAT_SAMPLE_WEATHER.get(name.lower())
+                if weather:
+                    return dict(weather)
         
         # Default Gujarat weather
         return {'temperature': 31.0, 'humidity': 55.0, 'rainfall': 1.0, 'description': 'typical gujarat weather'}
     
     def _get_gujarat_sample_soil_data(self, lat, lon):
-        """Return sample soil data for Gujarat regions"""
+        """Return sample soil data for the Gujarat region containing the coordinates"""
+        region = gujarat_locator.region_for(lat, lon)
+        soil_type = gujarat_locator.soil_type_for(lat, lon)
+        if region and soil_type in GUJARAT_SOIL_SAMPLE_VALUES:
+            return dict(
+                GUJARAT_SOIL_SAMPLE_VALUES[soil_type],
+                soil_type=GUJARAT_REGIONS[region]['soil_type'],
+                region=region,
+                source='Sample data'
+            )
+        
         # Gujarat has diverse soil types: Black soil (North), Red soil (Saurashtra), Alluvial soil (South)
         return {
             'N': 75.0,  # Medium nitrogen content
@@ -366,58 +828,18 @@ class APIService:
         }
     
     def _get_gujarat_coordinates(self, location):
-        """Return coordinates for major Gujarat cities"""
-        gujarat_cities = {
-            'ahmedabad': {'lat': 23.0225, 'lon': 72.5714},
-            'surat': {'lat': 21.1702, 'lon': 72.8311},
-            'vadodara': {'lat': 22.3072, 'lon': 73.1812},
-            'rajkot': {'lat': 22.3039, 'lon': 70.8022},
-            'bhavnagar': {'lat': 21.7645, 'lon': 72.1519},
-            'jamnagar': {'lat': 22.4707, 'lon': 70.0737},
-            'anand': {'lat': 22.5607, 'lon': 72.9628},
-            'mehsana': {'lat': 23.5986, 'lon': 72.3764},
-            'gandhinagar': {'lat': 23.2156, 'lon': 72.6369},
-            'bharuch': {'lat': 21.6948, 'lon': 72.9805},
-            'nadiad': {'lat': 22.6939, 'lon': 72.8616},
-            'patan': {'lat': 23.8507, 'lon': 72.1147}
-        }
-        
-        location_lower = location.lower()
-        for city, coords in gujarat_cities.items():
-            if city in location_lower:
-                return coords
+        """Return coordinates for Gujarat cities, districts and gazetteer places"""
+        place = location_index.resolve(location)
+        if place:
+            return {'lat': place.lat, 'lon': place.lon}
         
         # Default to Ahmedabad coordinates
+        logger.warning(f"Could not resolve location '{location}', defaulting to Ahmedabad")
         return {'lat': 23.0225, 'lon': 72.5714}
     
-    def _get_gujarat_mandi_prices(self, crop_name):
+    def _get_gujarat_mandi_prices(self, crop_name, market=None):
         """Return sample mandi prices for Gujarat markets"""
-        # Gujarat mandi prices (approximate, based on recent trends)
-        gujarat_crop_prices = {
-            'cotton': 6500,      # Major crop in Gujarat
-            'groundnut': 5200,   # Important oilseed
-            'wheat': 2200,       # Rabi crop
-            'rice': 2800,        # Kharif crop
-            'maize': 1800,       # Popular in Central Gujarat
-            'sugarcane': 320,    # Major crop in South Gujarat
-            'pulses': 4500,      # Various pulses
-            'oilseeds': 3800,    # Sesame, mustard, etc.
-            'vegetables': 1500,  # Tomatoes, onions, etc.
-            'fruits': 2800,      # Mangoes, bananas, etc.
-            'muskmelon': 1800,   # Summer fruit
-            'watermelon': 1200,  # Summer fruit
-            'cucumber': 800,     # Summer vegetable
-            'tomato': 1200,      # Important vegetable
-            'onion': 1000,       # Important vegetable
-            'potato': 1400,      # Rabi vegetable
-            'chilli': 8000,      # Spice crop
-            'sesame': 4500,      # Oilseed
-            'mustard': 4200,     # Oilseed
-            'bajra': 1600,       # Millet
-            'jowar': 1400        # Sorghum
-        }
-        
-        price = gujarat_crop_prices.get(crop_name.lower(), 2500)
+        price = crop_knowledge.reference_price(crop_name)
         
         # Major Gujarat mandis
         gujarat_mandis = [
@@ -429,12 +851,13 @@ class APIService:
         return {
             'crop': crop_name,
             'price_per_quintal': price,
-            'market': 'Gujarat APMC Market',
+            'market': GUJARAT_APMC_MARKETS[market]['name'] if market else 'Gujarat APMC Market',
             'date': datetime.now().strftime('%Y-%m-%d'),
             'region': 'Gujarat, India',
             'notes': 'Prices may vary by mandi and season',
             'source': 'Sample data'
         }
 
-# Global API service instance
+# Global API service instance, closed when the worker process exits
 api_service = APIService()
+atexit.register(api_service.close)
@@ -0,0 +1,126 @@
+"""
+In-process response caching for the Crop Recommendation System
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a time-to-live (None: never)"""
+
+    def __init__(self, maxsize=1024, ttl=3600, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._timer():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used entries if full"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._timer() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def expires_in(self, key):
+        """Seconds until key expires: 0 if it is missing or expired, None if it never expires"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return 0
+            expires_at = entry[1]
+            if expires_at is None:
+                return None
+            return max(0.0, expires_at - self._timer())
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class ResponseCache:
+    """A TTLCache per upstream namespace (weather, geocoding, soil, mandi)
+
+    Any object with the same get/set/clear/stats methods can be handed to
+    APIService instead, e.g. a wrapper around a shared cache backend.
+    """
+
+    def __init__(self, ttls, maxsize=1024):
+        self._caches = {namespace: TTLCache(maxsize, ttl) for namespace, ttl in ttls.items()}
+
+    def get(self, namespace, key, default=None):
+        return self._caches[namespace].get(key, default)
+
+    def set(self, namespace, key, value, ttl=None):
+        self._caches[namespace].set(key, value, ttl)
+
+    def expires_in(self, namespace, key):
+        return self._caches[namespace].expires_in(key)
+
+    def clear(self, namespace=None):
+        caches = [self._caches[namespace]] if namespace else self._caches.values()
+        for cache in caches:
+            cache.clear()
+
+    def stats(self):
+        return {namespace: cache.stats() for namespace, cache in self._caches.items()}
+
+
+def normalize_location(location):
+    """Case-fold a place name and collapse whitespace so equivalent spellings share a key"""
+    return re.sub(r'\s+', ' ', str(location)).strip().casefold()
+
+
+def normalize_coordinates(lat, lon, precision=2):
+    """Round coordinates so nearby points share a key (2 decimals is roughly 1 km)"""
+    return (round(float(lat), precision), round(float(lon), precision))
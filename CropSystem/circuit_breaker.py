@@ -0,0 +1,147 @@
+"""
+Circuit breakers for the upstream APIs used by the Crop Recommendation System
+
+Once an upstream has failed repeatedly its breaker opens and calls are
+refused immediately, so APIService serves its fallback data without
+waiting for a timeout. After a cool-down one probe call is let through; if
+it succeeds the breaker closes again, otherwise it re-opens.
+
+Only errors that say something about the upstream's health count as
+failures; is_failure decides which (by default every exception does).
+Anything else is raised to the caller without touching the breaker's state.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30, timer=time.monotonic, is_failure=None):
+        self.name = name
+        self.is_failure = is_failure or (lambda error: True)
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and self._timer() - self._opened_at >= self.recovery_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def allow_request(self):
+        """Return True if a call may go to the upstream right now"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                # Let exactly one probe through; everyone else keeps getting the fallback
+                self._state = HALF_OPEN
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self._failures} failures")
+                self._state = OPEN
+                self._opened_at = self._timer()
+
+    def admit(self):
+        """Raise CircuitOpenError unless a call may go to the upstream right now
+
+        An admitted caller must go on to run() or run_async(), or call
+        release() if it ends up not calling the upstream (e.g. over quota).
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit for {self.name} is open")
+
+    def call(self, func, *args, **kwargs):
+        """Run func through the breaker, raising CircuitOpenError if the circuit is open"""
+        self.admit()
+        return self.run(func, *args, **kwargs)
+
+    def run(self, func, *args, **kwargs):
+        """Run func for an admitted caller and record the outcome"""
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._record_error(e)
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """Await func(*args, **kwargs) through the breaker; cancellation is not recorded either way"""
+        self.admit()
+        return await self.run_async(func, *args, **kwargs)
+
+    async def run_async(self, func, *args, **kwargs):
+        """Await func for an admitted caller and record the outcome"""
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self._record_error(e)
+            raise
+        except BaseException:
+            # Cancelled by a deadline or a client that went away, which says nothing about the upstream
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    def release(self):
+        """Let another probe through after an admitted call ended without a verdict"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _record_error(self, error):
+        if self.is_failure(error):
+            self.record_failure()
+        else:
+            # The upstream answered (e.g. a 404 for an unknown city), so it is healthy
+            self.record_success()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'rejected': self.rejected,
+            }
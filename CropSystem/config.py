@@ -23,3 +23,77 @@ class Config:
     
     # Cache settings
     CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', 3600))  # 1 hour
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))  # per upstream
+    WEATHER_CACHE_TIMEOUT = int(os.getenv('WEATHER_CACHE_TIMEOUT', 600))  # 10 minutes
+    GEOCODE_CACHE_TIMEOUT = int(os.getenv('GEOCODE_CACHE_TIMEOUT', 30 * 86400))  # places don't move
+    SOIL_CACHE_TIMEOUT = int(os.getenv('SOIL_CACHE_TIMEOUT', 7 * 86400))  # 1 week
+    MANDI_CACHE_TIMEOUT = int(os.getenv('MANDI_CACHE_TIMEOUT', CACHE_TIMEOUT))
+    COORDINATE_CACHE_PRECISION = int(os.getenv('COORDINATE_CACHE_PRECISION', 2))  # decimal places
+    
+    # HTTP caching of GET API responses: max-age follows the data's freshness, capped here;
+    # responses built from fallback/sample data get the short fallback max-age
+    HTTP_MAX_AGE = int(os.getenv('HTTP_MAX_AGE', 86400))
+    HTTP_FALLBACK_MAX_AGE = int(os.getenv('HTTP_FALLBACK_MAX_AGE', 60))
+    
+    # Persisted responses past their cache timeout are served this much longer while a refresh runs
+    STALE_RESPONSE_MAX_AGE = int(os.getenv('STALE_RESPONSE_MAX_AGE', 86400))  # 1 day
+    STORE_PURGE_EVERY = int(os.getenv('STORE_PURGE_EVERY', 1000))  # purge expired responses every N writes, 0 disables
+    
+    # Village/taluka gazetteer CSV (name, district, lat, lon) loaded into the location index;
+    # places OpenWeather geocodes inside Gujarat are appended so they resolve offline next time ('' disables).
+    # Relative paths are under the project root; the default file is git-ignored
+    GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', 'gujarat_gazetteer.csv')
+    
+    # Upstream HTTP connection pools (one pooled keep-alive session per upstream API)
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 4))  # host pools per session
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))  # kept-alive connections per host
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 0))
+    UPSTREAM_WORKERS = int(os.getenv('UPSTREAM_WORKERS', 16))  # threads for concurrent upstream calls
+    DB_WORKERS = int(os.getenv('DB_WORKERS', 8))  # threads for the async views' database calls (store, quota)
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', 200))  # async views' shared httpx pool
+    
+    # Request deadline: total seconds a view may spend on upstream calls (keep below the load balancer's 30 s),
+    # and the least time worth starting another upstream call with; calls that can't fit get fallback data
+    REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 25))
+    UPSTREAM_MIN_TIMEOUT = float(os.getenv('UPSTREAM_MIN_TIMEOUT', 1.0))
+    
+    # Circuit breakers: consecutive failures before an upstream is skipped, and cool-down before probing it
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+    CIRCUIT_RECOVERY_TIMEOUT = int(os.getenv('CIRCUIT_RECOVERY_TIMEOUT', 30))  # seconds
+    
+    # Upstream quotas: calls per second and calls per UTC day (shared by all workers) for each API, 0 = unlimited.
+    # Calls over quota get cached or fallback data at once; prefetch jobs may not use the user-reserved share
+    OPENWEATHER_RATE_LIMIT = float(os.getenv('OPENWEATHER_RATE_LIMIT', 1.0))  # free tier is 60/min
+    OPENWEATHER_DAILY_QUOTA = int(os.getenv('OPENWEATHER_DAILY_QUOTA', 1000))  # free tier is ~1,000/day
+    SOIL_RATE_LIMIT = float(os.getenv('SOIL_RATE_LIMIT', 0))
+    SOIL_DAILY_QUOTA = int(os.getenv('SOIL_DAILY_QUOTA', 0))
+    MANDI_RATE_LIMIT = float(os.getenv('MANDI_RATE_LIMIT', 0))
+    MANDI_DAILY_QUOTA = int(os.getenv('MANDI_DAILY_QUOTA', 0))
+    UPSTREAM_BURST = int(os.getenv('UPSTREAM_BURST', 5))  # calls allowed back to back before the rate limit applies
+    QUOTA_USER_RESERVE = float(os.getenv('QUOTA_USER_RESERVE', 0.2))  # share of each quota kept for user-facing calls
+    
+    # Largest number of (crop, market) price lookups accepted by /api/get-crop-prices-bulk/
+    MANDI_BULK_MAX_LOOKUPS = int(os.getenv('MANDI_BULK_MAX_LOOKUPS', 200))
+    
+    # manage.py warm_cache: concurrent fetches, and requests per second allowed to each upstream
+    WARM_CACHE_WORKERS = int(os.getenv('WARM_CACHE_WORKERS', 4))
+    WARM_CACHE_RATE_LIMIT = float(os.getenv('WARM_CACHE_RATE_LIMIT', 1.0))  # OpenWeather free tier is 60/min
+    
+    # Model artifacts (the memory-mapped directory is preferred over the pickle)
+    MODEL_PATH = os.getenv('MODEL_PATH', 'crop_model.pkl')
+    MODEL_ARTIFACT_PATH = os.getenv('MODEL_ARTIFACT_PATH', 'crop_model')
+    MODEL_RELOAD_INTERVAL = int(os.getenv('MODEL_RELOAD_INTERVAL', 30))  # seconds, 0 disables
+    
+    # Prediction cache: entries kept, and decimals features are rounded to before lookup and inference
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 4096))
+    PREDICTION_CACHE_DECIMALS = int(os.getenv('PREDICTION_CACHE_DECIMALS', 2))
+    
+    # Ranked recommendations: default and largest number of candidate crops returned
+    RECOMMEND_TOP_K = int(os.getenv('RECOMMEND_TOP_K', 3))
+    RECOMMEND_MAX_K = int(os.getenv('RECOMMEND_MAX_K', 10))
+    
+    # Batch prediction settings
+    PREDICT_BATCH_CHUNK_SIZE = int(os.getenv('PREDICT_BATCH_CHUNK_SIZE', 5000))
+    PREDICT_BATCH_MAX_ROWS = int(os.getenv('PREDICT_BATCH_MAX_ROWS', 100000))
+    PREDICT_BATCH_ROW_BYTES = int(os.getenv('PREDICT_BATCH_ROW_BYTES', 256))  # body allowance per row; the body limit is MAX_ROWS times this
+    PREDICT_STREAM_CHUNK_SIZE = int(os.getenv('PREDICT_STREAM_CHUNK_SIZE', 1000))  # rows per streamed chunk of a CSV upload
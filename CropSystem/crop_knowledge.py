@@ -0,0 +1,135 @@
+"""
+Crop knowledge base for the Crop Recommendation System
+
+Merges the Gujarat crop calendar, crop details, Gujarati names and mandi
+reference prices from gujarat_config into one immutable index that is built
+once at import and answers lookups by name or alias in O(1).
+"""
+
+import calendar
+import re
+from collections import namedtuple
+from types import MappingProxyType
+
+from .gujarat_config import (
+    GUJARAT_CROP_ALIASES, GUJARAT_CROP_CALENDAR, GUJARAT_CROPS, GUJARAT_DEFAULT_CROP_CALENDAR,
+    GUJARAT_REFERENCE_PRICES
+)
+
+# Price used when a crop has no reference price (matches the mandi API default)
+DEFAULT_REFERENCE_PRICE = 2500
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+ALL_MONTHS = tuple(range(1, 13))
+
+CropRecord = namedtuple('CropRecord', [
+    'name', 'gujarati_name', 'season', 'regions', 'calendar', 'price_per_quintal',
+    'planting_months', 'harvest_months', 'details'
+])
+
+
+def normalize_crop_name(name):
+    """Case-fold a crop name and collapse whitespace, hyphens and underscores"""
+    return re.sub(r'[\s_-]+', ' ', str(name)).strip().casefold()
+
+
+def month_number(month):
+    """Accept 1-12, '6', 'June' or 'jun' and return the month number"""
+    if isinstance(month, str) and month.strip().isdigit():
+        month = int(month)
+    if isinstance(month, int):
+        if 1 <= month <= 12:
+            return month
+        raise ValueError(f"Invalid month: {month}")
+    key = str(month).strip().lower()
+    for name, number in MONTHS.items():
+        if name == key or name[:3] == key:
+            return number
+    raise ValueError(f"Invalid month: {month}")
+
+
+def month_window(start, end):
+    """Expand a calendar window such as November-February into month numbers"""
+    if start == 'Year-round' or end == 'Year-round':
+        return ALL_MONTHS
+    try:
+        first, last = month_number(start), month_number(end)
+    except ValueError:
+        return ()
+    length = (last - first) % 12 + 1
+    return tuple((first - 1 + offset) % 12 + 1 for offset in range(length))
+
+
+class CropKnowledgeBase:
+    def __init__(self, records, aliases):
+        self._records = MappingProxyType(dict(records))
+        self._index = MappingProxyType(dict(aliases))
+        self._planting_index = self._month_index('planting_months')
+        self._harvest_index = self._month_index('harvest_months')
+
+    @classmethod
+    def from_config(cls):
+        """Build the knowledge base from the tables in gujarat_config"""
+        names = set(GUJARAT_CROP_CALENDAR) | set(GUJARAT_REFERENCE_PRICES) | set(GUJARAT_CROPS)
+        records = {}
+        aliases = {}
+
+        for name in sorted(names):
+            details = GUJARAT_CROPS.get(name, {})
+            crop_calendar = GUJARAT_CROP_CALENDAR.get(name, GUJARAT_DEFAULT_CROP_CALENDAR)
+            records[name] = CropRecord(
+                name=name,
+                gujarati_name=details.get('gujarati_name'),
+                season=details.get('season'),
+                regions=tuple(details.get('regions', ())),
+                calendar=MappingProxyType(dict(crop_calendar)),
+                price_per_quintal=GUJARAT_REFERENCE_PRICES.get(name, DEFAULT_REFERENCE_PRICE),
+                planting_months=month_window(crop_calendar['planting_start'], crop_calendar['planting_end']),
+                harvest_months=month_window(crop_calendar['harvest_start'], crop_calendar['harvest_end']),
+                details=MappingProxyType(dict(details))
+            )
+            aliases[normalize_crop_name(name)] = name
+            if details.get('gujarati_name'):
+                aliases[normalize_crop_name(details['gujarati_name'])] = name
+
+        for alias, name in GUJARAT_CROP_ALIASES.items():
+            aliases[normalize_crop_name(alias)] = name
+
+        return cls(records, aliases)
+
+    def _month_index(self, field):
+        index = {month: [] for month in ALL_MONTHS}
+        for record in self._records.values():
+            for month in getattr(record, field):
+                index[month].append(record.name)
+        return MappingProxyType({month: tuple(names) for month, names in index.items()})
+
+    @property
+    def names(self):
+        return tuple(self._records)
+
+    def get(self, name):
+        """Return the CropRecord for a crop name, Gujarati name or alias (None if unknown)"""
+        key = self._index.get(normalize_crop_name(name))
+        return self._records.get(key) if key else None
+
+    def calendar(self, name):
+        """Planting and harvest calendar in the shape returned by get_planting_harvest_times"""
+        record = self.get(name)
+        return dict(record.calendar if record else GUJARAT_DEFAULT_CROP_CALENDAR)
+
+    def reference_price(self, name, default=DEFAULT_REFERENCE_PRICE):
+        record = self.get(name)
+        return record.price_per_quintal if record else default
+
+    def plantable_in(self, month):
+        """Crops whose planting window includes the given month"""
+        return self._planting_index[month_number(month)]
+
+    def harvestable_in(self, month):
+        """Crops whose harvest window includes the given month"""
+        return self._harvest_index[month_number(month)]
+
+
+# Global crop knowledge base, built once at import
+crop_knowledge = CropKnowledgeBase.from_config()
@@ -0,0 +1,78 @@
+"""
+Request-scoped deadlines for upstream API calls
+
+Views run under a Deadline covering the whole request. APIService gives each
+upstream call the time still remaining (capped at the call's usual timeout)
+and skips calls that could not finish in time, serving fallback data
+instead, so chained calls no longer add up past the load balancer's cut-off.
+The deadline lives in a context variable: asyncio tasks inherit it, and
+APIService._submit carries it into worker threads.
+"""
+
+import contextvars
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+
+from .config import Config
+
+_current_deadline = contextvars.ContextVar('upstream_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting an upstream call the request no longer has time for"""
+    pass
+
+
+class Deadline:
+    def __init__(self, budget, min_call_time=1.0, timer=time.monotonic):
+        self.min_call_time = min_call_time
+        self._timer = timer
+        self.expires_at = timer() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self._timer())
+
+    def check(self):
+        """Raise DeadlineExceeded if there is not enough time left to start another upstream call"""
+        if self.remaining() < self.min_call_time:
+            raise DeadlineExceeded(f"Less than {self.min_call_time}s of the request deadline left")
+
+    def timeout(self, default):
+        """Timeout for one upstream call: its usual timeout, cut to the time remaining"""
+        return min(default, self.remaining())
+
+
+def current_deadline():
+    """The Deadline of the request being served, or None outside a request"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def use_deadline(deadline):
+    """Run the block under deadline (None: no deadline, e.g. for background refreshes)"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def with_deadline(view):
+    """Decorate a sync or async view so its upstream calls share one REQUEST_DEADLINE budget"""
+    def new_deadline():
+        return Deadline(Config.REQUEST_DEADLINE, min_call_time=Config.UPSTREAM_MIN_TIMEOUT)
+
+    if inspect.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with use_deadline(new_deadline()):
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with use_deadline(new_deadline()):
+            return view(request, *args, **kwargs)
+    return wrapper
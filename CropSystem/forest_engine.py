@@ -0,0 +1,260 @@
+"""
+Flattened tree-ensemble inference engine for the crop RandomForest model
+
+A fitted RandomForestClassifier is compiled into flat contiguous arrays
+shared by all trees, so prediction is a handful of vectorized NumPy
+operations instead of a trip through sklearn's per-tree dispatch.
+
+The arrays can be saved as a directory of raw ``.npy`` files and reopened
+memory-mapped, so every worker process on a node shares the same read-only
+pages instead of unpickling a private copy of the forest.
+
+The flat walk wins for single rows and small batches, where sklearn's
+per-call overhead dominates; large matrices are handed to the original
+estimator, whose compiled tree traversal is faster than anything NumPy
+indexing can do. Only forests compiled from a fitted model in-process keep
+it: the artifact holds just the arrays, as shipping the estimator would
+have every worker unpickle its own copy again. Workers serving the
+artifact therefore walk large batches with the flat engine too, trading
+batch throughput for a single shared copy of the model.
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout written by save_forest changes
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'leaf_class', 'roots', 'classes']
+
+# Rows walked together in batch mode; keeps the per-level work arrays cache sized
+BATCH_BLOCK_ROWS = 1024
+
+# Matrices with at least this many rows go to the sklearn estimator when one is available.
+# Measured crossover for the 100-tree crop model: sklearn costs ~12 ms per call whatever the
+# size, the flat walk ~25 us per row
+ESTIMATOR_MIN_ROWS = 512
+
+
+class FlatForest:
+    """Read-only, array-backed replica of a fitted RandomForestClassifier
+
+    Node ``i`` tests ``x[feature[i]] <= threshold[i]`` and continues at
+    ``left[i]`` (true) or ``right[i]`` (false). Split nodes come first,
+    grouped by feature, followed by the leaves. Leaves point back at
+    themselves, so walking every tree for ``max_depth`` steps lands each row
+    on its leaf without any per-row branching. ``value`` holds the
+    normalized class distribution of each leaf and ``leaf_class`` its class
+    index; only one of the two is kept (``leaf_class`` when every leaf of
+    the forest is pure, which is the norm for fully grown trees).
+
+    ``estimator`` is the fitted sklearn forest used for large matrices;
+    without it every matrix is walked by the flat engine.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, leaf_class, roots, classes,
+                 max_depth, n_features, estimator=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.leaf_class = leaf_class
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+
+        n_splits = int(np.count_nonzero(left != np.arange(len(left))))
+        self._leaves = np.arange(n_splits, len(left), dtype=left.dtype)
+        self._split_counts = np.bincount(feature[:n_splits], minlength=self.n_features_in_)
+        self._split_threshold = threshold[:n_splits]
+        self._split_left = left[:n_splits]
+        self._split_right = right[:n_splits]
+
+        self.estimator = estimator
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees)"""
+        # sklearn compares features as float32, match it for exact parity
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if len(X) == 1:
+            return self._apply_row(X[0]).reshape(1, -1)
+        if len(X) <= BATCH_BLOCK_ROWS:
+            return self._apply_batch(X)
+        return np.concatenate([
+            self._apply_batch(X[start:start + BATCH_BLOCK_ROWS])
+            for start in range(0, len(X), BATCH_BLOCK_ROWS)
+        ])
+
+    def _apply_row(self, x):
+        """Evaluate every split once, then follow the resulting next-node table"""
+        split_values = np.repeat(x.astype(np.float64), self._split_counts)
+        step = np.concatenate((
+            np.where(split_values > self._split_threshold, self._split_right, self._split_left),
+            self._leaves
+        ))
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            nodes = step[nodes]
+        return nodes
+
+    def _apply_batch(self, X):
+        """Advance all (row, tree) pairs level by level, dropping finished ones"""
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        values = X.ravel()
+
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+        active = np.arange(n_rows * n_trees, dtype=np.intp)
+
+        for _ in range(self.max_depth):
+            current = nodes[active]
+            go_right = values[row_offsets[active] + self.feature[current]] > self.threshold[current]
+            following = np.where(go_right, self.right[current], self.left[current])
+            nodes[active] = following
+            active = active[following != current]
+            if not len(active):
+                break
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        """Average the leaf class distributions over all trees"""
+        if np.ndim(X) == 2 and len(X) >= ESTIMATOR_MIN_ROWS and self.estimator is not None:
+            X = np.asarray(X, dtype=np.float64)
+            # Estimators fitted on a DataFrame warn on every call given a bare array
+            names = getattr(self.estimator, 'feature_names_in_', None)
+            return self.estimator.predict_proba(X if names is None else pd.DataFrame(X, columns=names))
+        return self.flat_predict_proba(X)
+
+    def flat_predict_proba(self, X):
+        """predict_proba computed by the flat engine, whatever the number of rows"""
+        leaves = self.apply(X)
+        n_rows, n_trees = leaves.shape
+        n_classes = len(self.classes_)
+
+        if self.leaf_class is not None:
+            slots = np.arange(n_rows, dtype=np.intp)[:, None] * n_classes + self.leaf_class[leaves]
+            proba = np.bincount(slots.ravel(), minlength=n_rows * n_classes)
+            return proba.reshape(n_rows, n_classes) / n_trees
+
+        proba = np.zeros((n_rows, n_classes))
+        for tree in range(n_trees):
+            proba += self.value[leaves[:, tree]]
+        return proba / n_trees
+
+    def predict(self, X):
+        """Return the most probable crop label for every row"""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def compile_forest(model, keep_estimator=True):
+    """Flatten the trees of a fitted RandomForestClassifier into a FlatForest
+
+    With keep_estimator the FlatForest hands large matrices to model.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+
+    feature = np.concatenate([tree.feature for tree in trees])
+    threshold = np.concatenate([tree.threshold for tree in trees])
+    is_leaf = np.concatenate([tree.children_left == -1 for tree in trees])
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+    left = np.concatenate([
+        np.where(tree.children_left == -1, -1, tree.children_left + offset)
+        for tree, offset in zip(trees, offsets)
+    ])
+    right = np.concatenate([
+        np.where(tree.children_right == -1, -1, tree.children_right + offset)
+        for tree, offset in zip(trees, offsets)
+    ])
+    value = np.concatenate([tree.value[:, 0, :] for tree in trees])
+    totals = value.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1
+    value = value / totals
+
+    # Renumber so split nodes come first, grouped by feature, then the leaves
+    order = np.argsort(np.where(is_leaf, model.n_features_in_, feature), kind='stable')
+    position = np.empty(len(order), dtype=np.intp)
+    position[order] = np.arange(len(order))
+
+    is_leaf = is_leaf[order]
+    own = np.arange(len(order), dtype=np.intp)
+    feature = np.where(is_leaf, 0, feature[order]).astype(np.intp)
+    threshold = np.where(is_leaf, np.inf, threshold[order])
+    left = np.where(is_leaf, own, position[left[order]])
+    right = np.where(is_leaf, own, position[right[order]])
+    value = np.where(is_leaf[:, None], value[order], 0.0)
+    roots = position[offsets[:-1]]
+
+    # Fully grown forests have pure leaves, which lets predict_proba count votes
+    leaf_class = None
+    if np.all(value[is_leaf].max(axis=1) == 1.0):
+        leaf_class = value.argmax(axis=1).astype(np.intp)
+        value = None
+
+    max_depth = max(tree.max_depth for tree in trees)
+    return FlatForest(
+        feature, threshold, left, right, value, leaf_class, roots,
+        np.asarray(model.classes_, dtype=str), max_depth, model.n_features_in_,
+        estimator=model if keep_estimator else None
+    )
+
+
+def save_forest(forest, directory):
+    """Write a FlatForest as raw .npy arrays plus a metadata file
+
+    The artifact is assembled next to ``directory`` and moved into place at
+    the end, so readers never see a half-written model.
+    """
+    directory = os.path.abspath(directory)
+    staging = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    for name in ARTIFACT_ARRAYS:
+        array = forest.classes_ if name == 'classes' else getattr(forest, name)
+        if array is not None:
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+
+    with open(os.path.join(staging, 'meta.json'), 'w') as f:
+        json.dump({
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'max_depth': forest.max_depth,
+            'n_features': forest.n_features_in_,
+            'n_estimators': forest.n_estimators,
+        }, f)
+
+    previous = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.rename(directory, previous)
+    os.rename(staging, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def load_forest(directory, mmap=True):
+    """Open a FlatForest saved by save_forest, memory-mapped read-only by default"""
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact format: {meta.get('format_version')}")
+
+    arrays = {}
+    for name in ARTIFACT_ARRAYS:
+        path = os.path.join(directory, f"{name}.npy")
+        arrays[name] = np.load(path, mmap_mode='r' if mmap else None) if os.path.exists(path) else None
+
+    return FlatForest(
+        arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+        arrays['value'], arrays['leaf_class'], arrays['roots'], arrays['classes'],
+        meta['max_depth'], meta['n_features']
+    )
@@ -1,4 +1,5 @@
 from django import forms
+from .config import Config
 
 class CropForm(forms.Form):
     location = forms.CharField(
@@ -50,6 +51,21 @@ class CropForm(forms.Form):
         widget=forms.NumberInput(attrs={'class': 'form-control', 'readonly': 'readonly', 'step': '0.1'})
     )
     
+    # Ranked alternatives (optional): how many crops to show and how to order them
+    top_k = forms.IntegerField(
+        label='Alternatives',
+        required=False,
+        min_value=1,
+        max_value=Config.RECOMMEND_MAX_K,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    rank_by = forms.ChoiceField(
+        label='Rank by',
+        required=False,
+        choices=[('probability', 'Suitability'), ('revenue', 'Expected revenue')],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    
     def clean(self):
         cleaned_data = super().clean()
         # Ensure at least one set of parameters is provided
@@ -34,14 +34,89 @@ GUJARAT_REGIONS = {
     }
 }
 
-# Gujarat Major Crops with Details
+# District headquarters coordinates for every district in GUJARAT_REGIONS
+GUJARAT_DISTRICT_COORDINATES = {
+    'Ahmedabad': {'lat': 23.0225, 'lon': 72.5714},
+    'Gandhinagar': {'lat': 23.2156, 'lon': 72.6369},
+    'Mehsana': {'lat': 23.5986, 'lon': 72.3764},
+    'Patan': {'lat': 23.8507, 'lon': 72.1147},
+    'Banaskantha': {'lat': 24.1724, 'lon': 72.4346},
+    'Sabarkantha': {'lat': 23.5985, 'lon': 72.9664},
+    'Aravalli': {'lat': 23.4625, 'lon': 73.2988},
+    'Rajkot': {'lat': 22.3039, 'lon': 70.8022},
+    'Jamnagar': {'lat': 22.4707, 'lon': 70.0737},
+    'Bhavnagar': {'lat': 21.7645, 'lon': 72.1519},
+    'Amreli': {'lat': 21.6032, 'lon': 71.2221},
+    'Junagadh': {'lat': 21.5222, 'lon': 70.4579},
+    'Porbandar': {'lat': 21.6417, 'lon': 69.6293},
+    'Devbhoomi Dwarka': {'lat': 22.2020, 'lon': 69.6550},
+    'Gir Somnath': {'lat': 20.9070, 'lon': 70.3679},
+    'Botad': {'lat': 22.1693, 'lon': 71.6669},
+    'Surat': {'lat': 21.1702, 'lon': 72.8311},
+    'Valsad': {'lat': 20.5992, 'lon': 72.9342},
+    'Navsari': {'lat': 20.9467, 'lon': 72.9520},
+    'Bharuch': {'lat': 21.6948, 'lon': 72.9805},
+    'Narmada': {'lat': 21.8700, 'lon': 73.5030},
+    'Tapi': {'lat': 21.1106, 'lon': 73.3937},
+    'Dang': {'lat': 20.7570, 'lon': 73.6860},
+    'Vadodara': {'lat': 22.3072, 'lon': 73.1812},
+    'Anand': {'lat': 22.5607, 'lon': 72.9628},
+    'Kheda': {'lat': 22.6939, 'lon': 72.8616},
+    'Panchmahal': {'lat': 22.7788, 'lon': 73.6143},
+    'Dahod': {'lat': 22.8354, 'lon': 74.2550},
+    'Mahisagar': {'lat': 23.1286, 'lon': 73.6100},
+    'Chhota Udaipur': {'lat': 22.3048, 'lon': 74.0119}
+}
+
+# Towns that are known by a different name from their district
+# Coarse outline of the state as (lat, lon) vertices, within about 10 km along the land borders.
+# The seaward side runs offshore, so the coast and both gulfs (and the Daman and Diu enclaves) fall inside
+GUJARAT_BOUNDARY = [
+    (24.30, 68.75), (24.25, 69.50), (24.30, 70.10), (24.20, 70.60), (24.45, 71.10), (24.65, 71.60),
+    (24.60, 72.50), (24.35, 72.95), (23.95, 73.25), (23.55, 73.65), (23.35, 74.00), (23.25, 74.35),
+    (22.85, 74.45), (22.45, 74.20), (22.10, 74.15), (21.50, 74.00), (21.10, 73.80), (20.80, 73.85),
+    (20.50, 73.80), (20.20, 73.40), (20.15, 73.10), (20.10, 72.60), (20.50, 71.00), (20.75, 70.00),
+    (21.40, 69.30), (22.20, 68.85), (22.70, 68.60), (23.30, 68.20), (23.70, 68.05),
+]
+
+GUJARAT_TOWNS = {
+    'Nadiad': {'district': 'Kheda', 'lat': 22.6939, 'lon': 72.8616},
+    'Palanpur': {'district': 'Banaskantha', 'lat': 24.1724, 'lon': 72.4346},
+    'Himmatnagar': {'district': 'Sabarkantha', 'lat': 23.5985, 'lon': 72.9664},
+    'Modasa': {'district': 'Aravalli', 'lat': 23.4625, 'lon': 73.2988},
+    'Khambhalia': {'district': 'Devbhoomi Dwarka', 'lat': 22.2020, 'lon': 69.6550},
+    'Dwarka': {'district': 'Devbhoomi Dwarka', 'lat': 22.2394, 'lon': 68.9678},
+    'Veraval': {'district': 'Gir Somnath', 'lat': 20.9070, 'lon': 70.3679},
+    'Rajpipla': {'district': 'Narmada', 'lat': 21.8700, 'lon': 73.5030},
+    'Vyara': {'district': 'Tapi', 'lat': 21.1106, 'lon': 73.3937},
+    'Ahwa': {'district': 'Dang', 'lat': 20.7570, 'lon': 73.6860},
+    'Godhra': {'district': 'Panchmahal', 'lat': 22.7788, 'lon': 73.6143},
+    'Lunawada': {'district': 'Mahisagar', 'lat': 23.1286, 'lon': 73.6100},
+    'Gondal': {'district': 'Rajkot', 'lat': 21.9619, 'lon': 70.7923},
+    'Vapi': {'district': 'Valsad', 'lat': 20.3893, 'lon': 72.9106},
+    'Ankleshwar': {'district': 'Bharuch', 'lat': 21.6264, 'lon': 73.0152},
+    'Unjha': {'district': 'Mehsana', 'lat': 23.8040, 'lon': 72.3920},
+    'Deesa': {'district': 'Banaskantha', 'lat': 24.2585, 'lon': 72.1907}
+}
+
+# Sample weather used when the weather API is unavailable
+GUJARAT_SAMPLE_WEATHER = {
+    'ahmedabad': {'temperature': 32.5, 'humidity': 45.0, 'rainfall': 0.0, 'description': 'sunny'},
+    'surat': {'temperature': 30.2, 'humidity': 65.0, 'rainfall': 2.5, 'description': 'partly cloudy'},
+    'vadodara': {'temperature': 31.8, 'humidity': 50.0, 'rainfall': 0.0, 'description': 'clear sky'},
+    'rajkot': {'temperature': 33.1, 'humidity': 40.0, 'rainfall': 0.0, 'description': 'sunny'},
+    'bhavnagar': {'temperature': 29.5, 'humidity': 70.0, 'rainfall': 5.0, 'description': 'light rain'},
+    'jamnagar': {'temperature': 32.0, 'humidity': 55.0, 'rainfall': 0.0, 'description': 'clear sky'},
+    'anand': {'temperature': 30.5, 'humidity': 60.0, 'rainfall': 1.0, 'description': 'partly cloudy'},
+    'mehsana': {'temperature': 34.2, 'humidity': 35.0, 'rainfall': 0.0, 'description': 'sunny'}
+}
+
+# Gujarat Major Crops with Details (planting and harvest months come from GUJARAT_CROP_CALENDAR)
 GUJARAT_CROPS = {
     'cotton': {
         'gujarati_name': 'કપાસ',
         'regions': ['north_gujarat', 'saurashtra', 'central_gujarat'],
         'season': 'Kharif',
-        'planting_months': ['May', 'June'],
-        'harvest_months': ['October', 'November'],
         'soil_preference': 'Black soil, well-drained',
         'water_requirement': 'Medium',
         'major_districts': ['Ahmedabad', 'Rajkot', 'Vadodara', 'Mehsana']
@@ -50,8 +125,6 @@ GUJARAT_CROPS = {
         'gujarati_name': 'શેંગડા',
         'regions': ['saurashtra'],
         'season': 'Kharif',
-        'planting_months': ['June', 'July'],
-        'harvest_months': ['September', 'October'],
         'soil_preference': 'Sandy loam, well-drained',
         'water_requirement': 'Low to medium',
         'major_districts': ['Rajkot', 'Jamnagar', 'Amreli', 'Junagadh']
@@ -60,8 +133,6 @@ GUJARAT_CROPS = {
         'gujarati_name': 'ઘઉં',
         'regions': ['north_gujarat', 'central_gujarat'],
         'season': 'Rabi',
-        'planting_months': ['November', 'December'],
-        'harvest_months': ['March', 'April'],
         'soil_preference': 'Clay loam, fertile',
         'water_requirement': 'Medium',
         'major_districts': ['Ahmedabad', 'Mehsana', 'Vadodara', 'Anand']
@@ -70,8 +141,6 @@ GUJARAT_CROPS = {
         'gujarati_name': 'ચોખા',
         'regions': ['south_gujarat'],
         'season': 'Kharif',
-        'planting_months': ['June', 'July'],
-        'harvest_months': ['October', 'November'],
         'soil_preference': 'Clay loam, water-retaining',
         'water_requirement': 'High',
         'major_districts': ['Surat', 'Valsad', 'Navsari', 'Bharuch']
@@ -80,8 +149,6 @@ GUJARAT_CROPS = {
         'gujarati_name': 'મકાઈ',
         'regions': ['central_gujarat', 'north_gujarat'],
         'season': 'Kharif',
-        'planting_months': ['June', 'July'],
-        'harvest_months': ['September', 'October'],
         'soil_preference': 'Loamy soil, fertile',
         'water_requirement': 'Medium',
         'major_districts': ['Vadodara', 'Anand', 'Ahmedabad', 'Mehsana']
@@ -90,14 +157,203 @@ GUJARAT_CROPS = {
         'gujarati_name': 'શેરડી',
         'regions': ['south_gujarat'],
         'season': 'Year-round',
-        'planting_months': ['February', 'March'],
-        'harvest_months': ['December', 'March'],
         'soil_preference': 'Deep alluvial soil',
         'water_requirement': 'High',
         'major_districts': ['Surat', 'Bharuch', 'Valsad', 'Navsari']
     }
 }
 
+# Gujarat crop calendar based on local agricultural practices
+GUJARAT_CROP_CALENDAR = {
+    'cotton': {
+        'planting_start': 'May',
+        'planting_end': 'June',
+        'harvest_start': 'October',
+        'harvest_end': 'November',
+        'gujarat_notes': 'Major crop in Saurashtra and North Gujarat'
+    },
+    'groundnut': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Important oilseed crop in Saurashtra'
+    },
+    'wheat': {
+        'planting_start': 'November',
+        'planting_end': 'December',
+        'harvest_start': 'March',
+        'harvest_end': 'April',
+        'gujarat_notes': 'Rabi crop in North and Central Gujarat'
+    },
+    'rice': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'October',
+        'harvest_end': 'November',
+        'gujarat_notes': 'Kharif crop in South Gujarat'
+    },
+    'maize': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Popular in Central Gujarat'
+    },
+    'sugarcane': {
+        'planting_start': 'February',
+        'planting_end': 'March',
+        'harvest_start': 'December',
+        'harvest_end': 'March',
+        'gujarat_notes': 'Major crop in South Gujarat'
+    },
+    'pulses': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Various pulses grown across Gujarat'
+    },
+    'oilseeds': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Sesame, mustard, and other oilseeds'
+    },
+    'vegetables': {
+        'planting_start': 'Year-round',
+        'planting_end': 'Year-round',
+        'harvest_start': 'Year-round',
+        'harvest_end': 'Year-round',
+        'gujarat_notes': 'Tomatoes, onions, potatoes, etc.'
+    },
+    'muskmelon': {
+        'planting_start': 'February',
+        'planting_end': 'March',
+        'harvest_start': 'May',
+        'harvest_end': 'June',
+        'gujarat_notes': 'Summer fruit crop, popular in North and Central Gujarat'
+    },
+    'watermelon': {
+        'planting_start': 'January',
+        'planting_end': 'February',
+        'harvest_start': 'April',
+        'harvest_end': 'May',
+        'gujarat_notes': 'Summer fruit crop, grown across Gujarat'
+    },
+    'cucumber': {
+        'planting_start': 'February',
+        'planting_end': 'March',
+        'harvest_start': 'April',
+        'harvest_end': 'May',
+        'gujarat_notes': 'Summer vegetable crop'
+    },
+    'tomato': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Kharif vegetable crop, also grown in winter'
+    },
+    'onion': {
+        'planting_start': 'May',
+        'planting_end': 'June',
+        'harvest_start': 'August',
+        'harvest_end': 'September',
+        'gujarat_notes': 'Important vegetable crop in Gujarat'
+    },
+    'potato': {
+        'planting_start': 'October',
+        'planting_end': 'November',
+        'harvest_start': 'January',
+        'harvest_end': 'February',
+        'gujarat_notes': 'Rabi vegetable crop'
+    },
+    'chilli': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Spice crop, popular in Saurashtra'
+    },
+    'sesame': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Oilseed crop, major in Saurashtra'
+    },
+    'mustard': {
+        'planting_start': 'October',
+        'planting_end': 'November',
+        'harvest_start': 'February',
+        'harvest_end': 'March',
+        'gujarat_notes': 'Rabi oilseed crop'
+    },
+    'bajra': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Millet crop, drought-resistant'
+    },
+    'jowar': {
+        'planting_start': 'June',
+        'planting_end': 'July',
+        'harvest_start': 'September',
+        'harvest_end': 'October',
+        'gujarat_notes': 'Sorghum crop, grown in dry areas'
+    }
+}
+
+# Calendar returned for crops without a Gujarat-specific entry
+GUJARAT_DEFAULT_CROP_CALENDAR = {
+    'planting_start': 'Varies by region',
+    'planting_end': 'Varies by region',
+    'harvest_start': 'Varies by region',
+    'harvest_end': 'Varies by region',
+    'gujarat_notes': 'Check with local agricultural extension office'
+}
+
+# Gujarat mandi reference prices per quintal (approximate, based on recent trends)
+GUJARAT_REFERENCE_PRICES = {
+    'cotton': 6500,      # Major crop in Gujarat
+    'groundnut': 5200,   # Important oilseed
+    'wheat': 2200,       # Rabi crop
+    'rice': 2800,        # Kharif crop
+    'maize': 1800,       # Popular in Central Gujarat
+    'sugarcane': 320,    # Major crop in South Gujarat
+    'pulses': 4500,      # Various pulses
+    'oilseeds': 3800,    # Sesame, mustard, etc.
+    'vegetables': 1500,  # Tomatoes, onions, etc.
+    'fruits': 2800,      # Mangoes, bananas, etc.
+    'muskmelon': 1800,   # Summer fruit
+    'watermelon': 1200,  # Summer fruit
+    'cucumber': 800,     # Summer vegetable
+    'tomato': 1200,      # Important vegetable
+    'onion': 1000,       # Important vegetable
+    'potato': 1400,      # Rabi vegetable
+    'chilli': 8000,      # Spice crop
+    'sesame': 4500,      # Oilseed
+    'mustard': 4200,     # Oilseed
+    'bajra': 1600,       # Millet
+    'jowar': 1400        # Sorghum
+}
+
+# Alternative spellings and names that refer to the crops above
+GUJARAT_CROP_ALIASES = {
+    'peanut': 'groundnut',
+    'pearl millet': 'bajra',
+    'sorghum': 'jowar',
+    'chili': 'chilli',
+    'chillies': 'chilli',
+    'paddy': 'rice',
+    'corn': 'maize',
+    'til': 'sesame',
+    'rai': 'mustard',
+}
+
 # Gujarat APMC Markets
 GUJARAT_APMC_MARKETS = {
     'ahmedabad': {
@@ -230,3 +486,10 @@ GUJARAT_SOIL_CHARACTERISTICS = {
         'suitable_crops': ['Rice', 'Sugarcane', 'Vegetables', 'Fruits']
     }
 }
+
+# Representative soil test values per soil type, used when the soil API is unavailable
+GUJARAT_SOIL_SAMPLE_VALUES = {
+    'black_soil': {'N': 80.0, 'P': 32.0, 'K': 210.0, 'ph': 7.8, 'organic_carbon': 40.0},
+    'red_soil': {'N': 60.0, 'P': 40.0, 'K': 170.0, 'ph': 7.0, 'organic_carbon': 30.0},
+    'alluvial_soil': {'N': 85.0, 'P': 45.0, 'K': 150.0, 'ph': 6.8, 'organic_carbon': 50.0}
+}
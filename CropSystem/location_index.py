@@ -0,0 +1,272 @@
+"""
+Location index for resolving free-text Gujarat place names
+
+Built once from the districts in GUJARAT_REGIONS, the district and town
+coordinate tables, aliases for the APMC markets and an optional bulk-loaded village
+gazetteer. Lookups are exact (hash), prefix (binary search over sorted
+names) or typo-tolerant (trigram candidates ranked by edit distance), and
+return the district, region and coordinates together.
+"""
+
+import bisect
+import csv
+import logging
+import os
+import re
+import threading
+from collections import defaultdict, namedtuple
+from pathlib import Path
+
+from .config import Config
+from .gujarat_config import (
+    GUJARAT_APMC_MARKETS, GUJARAT_DISTRICT_COORDINATES, GUJARAT_REGIONS, GUJARAT_TOWNS
+)
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+GAZETTEER_FIELDS = ['name', 'district', 'lat', 'lon']
+
+ResolvedLocation = namedtuple('ResolvedLocation', ['name', 'district', 'region', 'lat', 'lon', 'match'])
+
+# Words that commonly follow a place name and should not block a match
+NOISE_WORDS = {'gujarat', 'india', 'district', 'city', 'taluka', 'village', 'in', 'near', 'the'}
+
+
+def normalize_place(name):
+    """Case-fold a place name, drop punctuation and collapse whitespace"""
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', str(name))).strip().casefold()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def resolve_gazetteer_path(path):
+    """Resolve a configured gazetteer path against the project root (None if disabled)"""
+    if not path:
+        return None
+    path = Path(path)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+def read_gazetteer(path):
+    """Read (name, district, lat, lon) rows from a gazetteer CSV; blank coordinates become None"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [
+            (row['name'], row['district'], row.get('lat') or None, row.get('lon') or None)
+            for row in csv.DictReader(f)
+        ]
+
+
+def write_gazetteer(path, rows):
+    """Atomically replace the gazetteer CSV at path with rows"""
+    path = Path(path)
+    staging = path.with_name(f".{path.name}.tmp")
+    with open(staging, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(GAZETTEER_FIELDS)
+        writer.writerows(rows)
+    os.replace(staging, path)
+
+
+class LocationIndex:
+    def __init__(self):
+        self._places = {}
+        self._sorted_keys = []
+        self._trigrams = defaultdict(set)
+        self._district_regions = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.gazetteer_path = None
+
+    @classmethod
+    def from_config(cls, gazetteer_path=None):
+        """Build the index from gujarat_config, plus a village gazetteer CSV if given"""
+        index = cls()
+        for region, info in GUJARAT_REGIONS.items():
+            for district in info['districts']:
+                index._district_regions[normalize_place(district)] = region
+
+        rows = []
+        for district, coords in GUJARAT_DISTRICT_COORDINATES.items():
+            rows.append((district, district, coords['lat'], coords['lon']))
+        for town, info in GUJARAT_TOWNS.items():
+            rows.append((town, info['district'], info['lat'], info['lon']))
+        index.add_many(rows)
+        for key, market in GUJARAT_APMC_MARKETS.items():
+            index.add_alias(market['name'], key)
+
+        index.gazetteer_path = resolve_gazetteer_path(gazetteer_path)
+        if index.gazetteer_path:
+            try:
+                index.load_csv(index.gazetteer_path)
+            except FileNotFoundError:
+                logger.info(f"No gazetteer found at {index.gazetteer_path}")
+        return index
+
+    def __len__(self):
+        return len(self._places)
+
+    def region_for_district(self, district):
+        return self._district_regions.get(normalize_place(district)) if district else None
+
+    def add_many(self, rows):
+        """Add (name, district, lat, lon) rows; missing coordinates are taken from the district"""
+        with self._lock:
+            new_keys = []
+            for name, district, lat, lon in rows:
+                key = normalize_place(name)
+                district = str(district).strip()
+                if not key:
+                    continue
+                if lat is None or lon is None:
+                    district_place = self._places.get(normalize_place(district))
+                    if district_place is None:
+                        continue
+                    lat, lon = district_place.lat, district_place.lon
+
+                if key not in self._places:
+                    new_keys.append(key)
+                    for gram in trigrams(key):
+                        self._trigrams[gram].add(key)
+                self._places[key] = ResolvedLocation(
+                    str(name).strip(), district, self.region_for_district(district),
+                    float(lat), float(lon), 'exact'
+                )
+
+            if new_keys:
+                self._sorted_keys = sorted(self._sorted_keys + new_keys)
+
+    def add_alias(self, alias, name):
+        """Make alias resolve to the same place as name"""
+        with self._lock:
+            place = self._places.get(normalize_place(name))
+            key = normalize_place(alias)
+            if place is None or not key:
+                return
+            if key not in self._places:
+                for gram in trigrams(key):
+                    self._trigrams[gram].add(key)
+                self._sorted_keys = sorted(self._sorted_keys + [key])
+            self._places[key] = place
+
+    def load_csv(self, path):
+        """Bulk-load a gazetteer CSV with name, district, lat and lon columns"""
+        rows = read_gazetteer(path)
+        self.add_many(rows)
+        logger.info(f"Loaded {len(rows)} gazetteer entries from {path}")
+
+    def remember(self, name, district, lat, lon):
+        """Add a geocoded place to the index and append it to the persisted gazetteer"""
+        if not normalize_place(name) or self.exact(name):
+            return
+        self.add_many([(name, district, lat, lon)])
+        if not self.gazetteer_path:
+            return
+
+        with self._write_lock:
+            try:
+                is_new = not self.gazetteer_path.exists()
+                with open(self.gazetteer_path, 'a', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    if is_new:
+                        writer.writerow(GAZETTEER_FIELDS)
+                    writer.writerow([str(name).strip(), district, lat, lon])
+            except OSError as e:
+                logger.warning(f"Could not write {name} to gazetteer {self.gazetteer_path}: {e}")
+
+    def exact(self, name):
+        """Place named by the whole of name, ignoring filler such as 'district' or 'Gujarat' (or None)"""
+        text = normalize_place(name)
+        place = self._places.get(text)
+        if place is None:
+            words = [word for word in text.split() if word not in NOISE_WORDS]
+            place = self._places.get(' '.join(words)) if words else None
+        return place
+
+    def prefix(self, text, limit=10):
+        """Places whose normalized name starts with text, in alphabetical order"""
+        text = normalize_place(text)
+        start = bisect.bisect_left(self._sorted_keys, text)
+        matches = []
+        for key in self._sorted_keys[start:start + limit]:
+            if not key.startswith(text):
+                break
+            matches.append(self._places[key])
+        return matches
+
+    def fuzzy(self, text, max_distance=None):
+        """Closest place within a typo budget, using trigram overlap to pick candidates"""
+        text = normalize_place(text)
+        if len(text) < 3:
+            return None
+        max_distance = max_distance if max_distance is not None else max(1, len(text) // 4)
+
+        overlap = defaultdict(int)
+        for gram in trigrams(text):
+            for key in list(self._trigrams.get(gram, ())):
+                overlap[key] += 1
+        candidates = sorted(overlap, key=overlap.get, reverse=True)[:20]
+
+        best, best_distance = None, max_distance + 1
+        for key in candidates:
+            distance = edit_distance(text, key, max_distance)
+            if distance < best_distance:
+                best, best_distance = key, distance
+        return self._places[best] if best else None
+
+    def resolve(self, query, fuzzy=True):
+        """Resolve free text such as 'Rajkot, Gujarat' or 'rajkott' to a ResolvedLocation (or None)
+
+        The match field says how: 'exact' when the query names the place
+        (see exact()), otherwise 'partial' (a run of its words), 'prefix' or
+        'fuzzy'. Only exact matches are certain to be the place the user meant.
+        """
+        text = normalize_place(query)
+        if not text:
+            return None
+
+        place = self.exact(text)
+        if place:
+            return place
+
+        # Try the words of the query, longest runs first, ignoring filler like 'district'
+        words = [word for word in text.split() if word not in NOISE_WORDS]
+        for size in range(min(len(words), 3), 0, -1):
+            for start in range(len(words) - size + 1):
+                place = self._places.get(' '.join(words[start:start + size]))
+                if place:
+                    return place._replace(match='partial')
+
+        candidate = ' '.join(words) or text
+        if len(candidate) >= 3:
+            matches = self.prefix(candidate, limit=2)
+            if len(matches) == 1:
+                return matches[0]._replace(match='prefix')
+
+        place = self.fuzzy(candidate) if fuzzy else None
+        if place:
+            return place._replace(match='fuzzy')
+        return None
+
+
+# Global location index, built once at import
+location_index = LocationIndex.from_config(Config.GAZETTEER_PATH)
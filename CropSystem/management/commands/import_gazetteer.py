@@ -0,0 +1,75 @@
+"""
+Bulk-import Gujarat villages/talukas into the offline geocoding gazetteer
+
+    python manage.py import_gazetteer villages.csv [more.csv ...]
+
+Input CSVs need name and lat/lon columns; district is optional and is filled
+in from the nearest known district when missing. Rows are merged into the
+gazetteer at Config.GAZETTEER_PATH (later rows win on duplicate names) and
+the file is replaced atomically, so running servers pick the places up on
+their next restart.
+"""
+
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CropSystem.config import Config
+from CropSystem.location_index import normalize_place, read_gazetteer, resolve_gazetteer_path, write_gazetteer
+from CropSystem.spatial_index import gujarat_locator
+
+
+class Command(BaseCommand):
+    help = 'Merge village/taluka CSVs into the offline geocoding gazetteer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_files', nargs='+', help='CSV files with name, lat, lon and optional district columns')
+        parser.add_argument('--output', default=Config.GAZETTEER_PATH, help='Gazetteer to merge into')
+
+    def handle(self, *args, **options):
+        output = resolve_gazetteer_path(options['output'])
+        if output is None:
+            raise CommandError('No gazetteer path configured (set GAZETTEER_PATH or pass --output)')
+
+        rows = {}
+        if output.exists():
+            for row in read_gazetteer(output):
+                rows[normalize_place(row[0])] = row
+        existing = len(rows)
+
+        skipped = 0
+        for path in options['csv_files']:
+            try:
+                with open(path, newline='', encoding='utf-8') as f:
+                    for row in csv.DictReader(f):
+                        parsed = self._parse_row(row)
+                        if parsed is None:
+                            skipped += 1
+                            continue
+                        rows[normalize_place(parsed[0])] = parsed
+            except (OSError, KeyError) as e:
+                raise CommandError(f"Could not read {path}: {e}")
+
+        write_gazetteer(output, rows.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Gazetteer {output}: {len(rows)} places ({len(rows) - existing} new, {skipped} rows skipped)"
+        ))
+
+    def _parse_row(self, row):
+        """Return a (name, district, lat, lon) tuple, or None if the row is unusable"""
+        name = (row.get('name') or '').strip()
+        district = (row.get('district') or '').strip()
+        try:
+            lat = float(row['lat']) if row.get('lat') else None
+            lon = float(row['lon']) if row.get('lon') else None
+        except ValueError:
+            return None
+
+        if not normalize_place(name):
+            return None
+        if lat is None or lon is None:
+            # The location index falls back to the district's coordinates
+            return (name, district, None, None) if district else None
+        if not district:
+            district = gujarat_locator.nearest_district(lat, lon)['district']
+        return (name, district, lat, lon)
@@ -0,0 +1,170 @@
+"""
+Score large feature files offline with the model the web app serves
+
+    python manage.py recommend_bulk plots.csv results.csv [--workers 8] [--chunk-size 50000]
+
+Input and output may be CSV or Parquet (chosen by file extension; Parquet
+needs pyarrow). The input is read in chunks and each chunk's feature columns
+are scored on a process pool whose workers load the model once at start-up.
+At most a few chunks per worker are in flight, so memory stays bounded, and
+results are written in input order with every input column kept plus crop,
+confidence and error columns. Progress and throughput go to stderr.
+"""
+
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from CropSystem.config import Config
+from CropSystem.model_registry import ModelRegistry
+from CropSystem.prediction import FEATURE_COLUMNS, predict_batch
+
+# Chunks queued per worker; enough to keep every core busy while the parent reads and writes
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+_worker_model = None
+_worker_error = None
+
+
+def _init_worker(artifact_path, pickle_path, version):
+    """Load the model once per worker process, refusing to score with a different version"""
+    global _worker_model, _worker_error
+    # Errors are reported from _score: a failing pool initializer would just be respawned forever
+    loaded = ModelRegistry(artifact_path, pickle_path, reload_interval=0).current()
+    if loaded is None or loaded.version != version:
+        _worker_error = f"Worker could not load model version {version}"
+    else:
+        _worker_model = loaded.model
+
+
+def _score(features):
+    """Score a float matrix in a worker, returning crop labels and confidences"""
+    if _worker_error:
+        raise RuntimeError(_worker_error)
+    crops, confidences = predict_batch(_worker_model, features, Config.PREDICT_BATCH_CHUNK_SIZE)
+    return np.asarray(crops, dtype=object), np.asarray(confidences, dtype=np.float64)
+
+
+def _is_parquet(path):
+    return str(path).lower().endswith(('.parquet', '.pq'))
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise CommandError('Parquet files require pyarrow (pip install pyarrow)')
+    return pyarrow
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file"""
+    if _is_parquet(path):
+        pyarrow = _import_pyarrow()
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Append DataFrames to a CSV or Parquet file, writing the header once"""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet_writer = None
+        self._started = False
+
+    def write(self, frame):
+        if _is_parquet(self.path):
+            pyarrow = _import_pyarrow()
+            table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a' if self._started else 'w', header=not self._started, index=False)
+        self._started = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def feature_matrix(frame):
+    """Extract the model features from a chunk; returns the matrix and a mask of usable rows"""
+    missing = [column for column in FEATURE_COLUMNS if column not in frame.columns]
+    if missing:
+        raise CommandError(f"Input is missing feature columns: {', '.join(missing)}")
+    features = frame[FEATURE_COLUMNS].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    return features, np.isfinite(features).all(axis=1)
+
+
+class Command(BaseCommand):
+    help = 'Score a CSV/Parquet file of feature rows on a process pool and write recommendations in order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='CSV or Parquet file with N, P, K, temperature, humidity, ph and rainfall columns')
+        parser.add_argument('output', help='CSV or Parquet file to write')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per chunk sent to a worker')
+
+    def handle(self, *args, **options):
+        registry = ModelRegistry(Config.MODEL_ARTIFACT_PATH, Config.MODEL_PATH, reload_interval=0)
+        loaded = registry.current()
+        if loaded is None:
+            raise CommandError('Model not available')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        if _is_parquet(options['input']) or _is_parquet(options['output']):
+            _import_pyarrow()
+
+        workers = max(1, options['workers'])
+        self.stderr.write(f"Scoring {options['input']} with model {loaded.version} on {workers} workers")
+
+        started = time.monotonic()
+        total = 0
+        writer = ChunkWriter(options['output'])
+        pending = deque()
+        try:
+            with Pool(workers, initializer=_init_worker,
+                      initargs=(registry.artifact_path, registry.pickle_path, loaded.version)) as pool:
+                for frame in read_chunks(options['input'], options['chunk_size']):
+                    features, valid = feature_matrix(frame)
+                    pending.append((frame, valid, pool.apply_async(_score, (features[valid],))))
+                    if len(pending) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                        total += self._write_result(writer, *pending.popleft(), started, total)
+                while pending:
+                    total += self._write_result(writer, *pending.popleft(), started, total)
+        finally:
+            writer.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s) "
+            f"-> {options['output']}"
+        ))
+
+    def _write_result(self, writer, frame, valid, result, started, done):
+        """Wait for one chunk's scores, write it out and report progress; returns its row count"""
+        crops, confidences = result.get()
+
+        frame = frame.copy()
+        frame['crop'] = None
+        frame['confidence'] = np.nan
+        frame['error'] = None
+        frame.loc[valid, 'crop'] = crops
+        frame.loc[valid, 'confidence'] = np.round(confidences, 4)
+        frame.loc[~valid, 'error'] = 'Missing or non-numeric feature value'
+        writer.write(frame)
+
+        done += len(frame)
+        elapsed = time.monotonic() - started
+        self.stderr.write(f"  {done:,} rows ({done / elapsed if elapsed else 0:,.0f} rows/s)")
+        return len(frame)
@@ -0,0 +1,103 @@
+"""
+Prefetch weather for every Gujarat district and mandi prices for every crop
+
+    python manage.py warm_cache [--workers 4] [--rate 1.0] [--skip-fresh]
+
+Meant to run from cron a little more often than WEATHER_CACHE_TIMEOUT.
+Fetches run concurrently on a bounded pool, each upstream is held to --rate
+requests per second and to the prefetch share of its quota (see quota.py),
+and results are bulk-upserted into the persisted response store that every
+worker reads, so peak-time requests find warm data.
+Failed fetches, including those over the daily budget, are reported and
+skipped; nothing is written for them.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from CropSystem.api_services import api_service
+from CropSystem.config import Config
+from CropSystem.crop_knowledge import crop_knowledge
+from CropSystem.model_registry import model_registry
+from CropSystem.quota import PREFETCH
+from CropSystem.rate_limit import RateLimiter
+
+
+class Command(BaseCommand):
+    help = 'Prefetch weather for all districts and mandi prices for all crops into the shared cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=Config.WARM_CACHE_WORKERS,
+                            help='Concurrent upstream requests')
+        parser.add_argument('--rate', type=float, default=Config.WARM_CACHE_RATE_LIMIT,
+                            help='Requests per second allowed to each upstream (0 for unlimited)')
+        parser.add_argument('--skip-fresh', action='store_true',
+                            help='Skip entries the response store still holds as fresh')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # Prices for the model's crops too when it is loaded; weather and knowledge-base crops need no model
+        model = model_registry.get()
+        model_crops = {str(crop) for crop in model.classes_} if model is not None else set()
+        crops = sorted(set(crop_knowledge.names) | model_crops)
+        targets = api_service.prefetch_targets(crops)
+
+        skipped = 0
+        if options['skip_fresh']:
+            pending = []
+            for target in targets:
+                stored = api_service.store.get(target[0], target[1])
+                if stored is not None and stored.fresh_for > 0:
+                    skipped += 1
+                else:
+                    pending.append(target)
+            targets = pending
+
+        limiters = {}
+        for namespace, _, _ in targets:
+            upstream = api_service.breakers[namespace].name
+            limiters.setdefault(upstream, RateLimiter(options['rate']))
+
+        def fetch(namespace, fetcher):
+            upstream = api_service.breakers[namespace].name
+            try:
+                limiters[upstream].acquire()
+                return api_service.admit(namespace, PREFETCH, wait=True).run(fetcher)
+            finally:
+                close_old_connections()
+
+        results = {}
+        failures = {}
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {
+                pool.submit(fetch, namespace, fetcher): (namespace, key)
+                for namespace, key, fetcher in targets
+            }
+            for future in as_completed(futures):
+                namespace, key = futures[future]
+                try:
+                    value = future.result()
+                except Exception as e:
+                    failures[namespace] = failures.get(namespace, 0) + 1
+                    self.stderr.write(f"{namespace} {key}: {e}")
+                    continue
+                if value is not None:
+                    results.setdefault(namespace, {})[key] = value
+
+        for namespace, items in results.items():
+            api_service.store.set_many(namespace, items)
+            for key, value in items.items():
+                api_service.cache.set(namespace, key, value)
+        purged = api_service.store.purge()
+
+        summary = ', '.join(
+            f"{namespace}: {len(results.get(namespace, {}))} fetched, {failures.get(namespace, 0)} failed"
+            for namespace in sorted(set(results) | set(failures))
+        ) or 'nothing fetched'
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed cache in {time.monotonic() - started:.1f}s ({summary}; "
+            f"{skipped} still fresh, {purged} expired entries purged)"
+        ))
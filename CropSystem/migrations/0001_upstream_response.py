@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpstreamResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=32)),
+                ('key', models.CharField(max_length=255)),
+                ('payload', models.JSONField()),
+                ('fetched_at', models.DateTimeField()),
+                ('fresh_until', models.DateTimeField()),
+                ('stale_until', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('namespace', 'key'), name='unique_upstream_response')],
+            },
+        ),
+    ]
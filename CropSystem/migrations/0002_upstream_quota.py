@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CropSystem', '0001_upstream_response'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpstreamQuota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upstream', models.CharField(max_length=32)),
+                ('day', models.DateField()),
+                ('used', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('upstream', 'day'), name='unique_upstream_quota_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,194 @@
+"""
+Model registry for the Crop Recommendation System
+
+Loads the crop model lazily on first use, watches the artifact on disk and
+swaps in a retrained model in the background without blocking requests.
+"""
+
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from pathlib import Path
+
+from .config import Config
+from .forest_engine import compile_forest, load_forest
+
+logger = logging.getLogger(__name__)
+
+# Relative artifact paths are resolved against the project root, not the CWD
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def resolve_model_path(path):
+    """Resolve a configured model path against the project root"""
+    path = Path(path)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+class LoadedModel:
+    """An immutable snapshot of a model together with where it came from"""
+
+    def __init__(self, model, version, source, loaded_at):
+        self.model = model
+        self.version = version
+        self.source = source
+        self.loaded_at = loaded_at
+
+
+class ModelRegistry:
+    def __init__(self, artifact_path, pickle_path, reload_interval=30):
+        self.artifact_path = resolve_model_path(artifact_path)
+        self.pickle_path = resolve_model_path(pickle_path)
+        self.reload_interval = reload_interval
+
+        self._current = None
+        self._signature = None
+        self._load_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self._listeners = []
+
+    def current(self):
+        """Return the current LoadedModel snapshot, loading it on first use (None if unavailable)"""
+        current = self._current
+        if current is None:
+            self.reload()
+            self._start_watcher()
+            current = self._current
+        return current
+
+    def get(self):
+        """Return the current model, loading it on first use (None if unavailable)"""
+        current = self.current()
+        return current.model if current else None
+
+    @property
+    def version(self):
+        """Short content hash of the loaded artifact, or None before the first load"""
+        current = self._current
+        return current.version if current else None
+
+    def info(self):
+        """Describe the loaded model for health checks and API responses"""
+        current = self._current
+        if current is None:
+            return {'loaded': False, 'version': None}
+        return {
+            'loaded': True,
+            'version': current.version,
+            'source': str(current.source),
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(current.loaded_at)),
+        }
+
+    def reload(self, force=False):
+        """Load the artifact if it changed on disk; returns True when a new model was swapped in"""
+        with self._load_lock:
+            source = self._source()
+            if source is None:
+                logger.error(f"No model artifact found at {self.artifact_path} or {self.pickle_path}")
+                return False
+            if self._current and self._current.source == self.artifact_path and source != self.artifact_path:
+                # The artifact directory is being replaced, pick up the new one on the next check
+                return False
+
+            try:
+                files = self._files(source)
+                signature = self._file_signature(files)
+            except OSError as e:
+                # Files are being replaced underneath us, look again on the next check
+                logger.warning(f"Could not stat model artifact {source}: {e}")
+                return False
+            if not force and signature == self._signature:
+                return False
+
+            try:
+                version = self._content_hash(files)
+                if not force and self._current and version == self._current.version:
+                    self._signature = signature
+                    return False
+                model = self._load(source)
+            except Exception as e:
+                # Keep serving the previous model; retry once the files change again
+                logger.error(f"Error loading model from {source}: {e}")
+                self._signature = signature
+                return False
+
+            # Readers take a reference to the snapshot, so a single assignment swaps atomically
+            loaded = LoadedModel(model, version, source, time.time())
+            self._current = loaded
+            self._signature = signature
+            logger.info(f"Loaded crop model version {version} from {source}")
+
+        for callback in self._listeners:
+            try:
+                callback(loaded)
+            except Exception as e:
+                logger.error(f"Model reload listener failed: {e}")
+        return True
+
+    def add_listener(self, callback):
+        """Call callback(loaded_model) every time a new model is swapped in"""
+        self._listeners.append(callback)
+
+    def stop(self):
+        """Stop the background watcher thread"""
+        self._stop.set()
+
+    def _source(self):
+        if self.artifact_path.is_dir():
+            return self.artifact_path
+        if self.pickle_path.is_file():
+            return self.pickle_path
+        return None
+
+    @staticmethod
+    def _files(source):
+        if source.is_dir():
+            return sorted(path for path in source.iterdir() if path.is_file())
+        return [source]
+
+    @staticmethod
+    def _file_signature(files):
+        signature = []
+        for path in files:
+            stat = path.stat()
+            signature.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    @staticmethod
+    def _content_hash(files):
+        digest = hashlib.sha256()
+        for path in files:
+            digest.update(path.name.encode())
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        return digest.hexdigest()[:12]
+
+    @staticmethod
+    def _load(source):
+        if source.is_dir():
+            return load_forest(source)
+        with open(source, 'rb') as f:
+            return compile_forest(pickle.load(f))
+
+    def _start_watcher(self):
+        if self.reload_interval <= 0 or self._watcher is not None:
+            return
+        with self._load_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name='model-registry-watcher', daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Model watcher error: {e}")
+
+
+# Global model registry instance
+model_registry = ModelRegistry(Config.MODEL_ARTIFACT_PATH, Config.MODEL_PATH, Config.MODEL_RELOAD_INTERVAL)
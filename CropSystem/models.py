@@ -1,3 +1,34 @@
 from django.db import models
 
-# Create your models here.
+
+class UpstreamResponse(models.Model):
+    """An upstream API response (weather, geocoding, soil or mandi) persisted across restarts"""
+    namespace = models.CharField(max_length=32)
+    key = models.CharField(max_length=255)
+    payload = models.JSONField()
+    fetched_at = models.DateTimeField()
+    fresh_until = models.DateTimeField()
+    stale_until = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['namespace', 'key'], name='unique_upstream_response'),
+        ]
+
+    def __str__(self):
+        return f"{self.namespace}:{self.key}"
+
+
+class UpstreamQuota(models.Model):
+    """Calls made to an upstream API on one (UTC) day, shared by every worker process"""
+    upstream = models.CharField(max_length=32)
+    day = models.DateField()
+    used = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['upstream', 'day'], name='unique_upstream_quota_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.upstream} {self.day}: {self.used}"
@@ -0,0 +1,187 @@
+"""
+Batch prediction helpers for the Crop Recommendation System
+"""
+
+import csv
+import io
+import numpy as np
+
+# Feature order expected by the model (see ML/train_model.py)
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Columns of the CSV written by iter_scored_csv
+RESULT_COLUMNS = ['row', 'crop', 'confidence', 'error']
+
+
+class FeatureValidationError(ValueError):
+    """Raised when submitted feature rows cannot be turned into a model matrix"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def parse_json_rows(payload):
+    """Turn a JSON payload into a list of raw feature rows
+
+    Accepts a list of rows or an object with a ``rows`` key. Each row is
+    either a list in FEATURE_COLUMNS order or a dict keyed by feature name.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('rows')
+    if not isinstance(payload, list):
+        raise FeatureValidationError('Expected a JSON array of feature rows')
+
+    rows = []
+    for row in payload:
+        if isinstance(row, dict):
+            rows.append([row.get(column) for column in FEATURE_COLUMNS])
+        else:
+            rows.append(row)
+    return rows
+
+
+def iter_csv_row_chunks(lines, chunk_size):
+    """Parse CSV lines incrementally, yielding lists of at most chunk_size raw feature rows
+
+    Like parse_csv_rows, a header row naming the feature columns is used when
+    present. Only one chunk is held in memory at a time.
+    """
+    indices = None
+    chunk = []
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        if indices is None:
+            header = [cell.strip() for cell in row]
+            if all(column in header for column in FEATURE_COLUMNS):
+                indices = [header.index(column) for column in FEATURE_COLUMNS]
+                continue
+            indices = False
+        if indices:
+            row = [row[i] if i < len(row) else None for i in indices]
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_csv_rows(text):
+    """Turn CSV text into a list of raw feature rows
+
+    A header row naming the feature columns is used when present, otherwise
+    columns are taken in FEATURE_COLUMNS order.
+    """
+    reader = csv.reader(io.StringIO(text))
+    rows = [row for row in reader if row]
+    if not rows:
+        return []
+
+    header = [cell.strip() for cell in rows[0]]
+    if all(column in header for column in FEATURE_COLUMNS):
+        indices = [header.index(column) for column in FEATURE_COLUMNS]
+        return [[row[i] if i < len(row) else None for i in indices] for row in rows[1:]]
+    return rows
+
+
+def validate_feature_rows(rows):
+    """Convert raw rows to a float matrix of shape (n, 7) without raising
+
+    Returns the matrix and a list of {'row', 'error'} dicts; rows with errors
+    are left as NaN in the matrix.
+    """
+    n_features = len(FEATURE_COLUMNS)
+    errors = []
+    matrix = np.full((len(rows), n_features), np.nan, dtype=np.float64)
+
+    for i, row in enumerate(rows):
+        if not isinstance(row, (list, tuple)) or len(row) != n_features:
+            errors.append({'row': i, 'error': f'Expected {n_features} values'})
+            continue
+        try:
+            matrix[i] = [float(value) for value in row]
+        except (TypeError, ValueError):
+            errors.append({'row': i, 'error': 'Non-numeric value'})
+            continue
+        if not np.isfinite(matrix[i]).all():
+            errors.append({'row': i, 'error': 'Non-finite value'})
+
+    return matrix, errors
+
+
+def build_feature_matrix(rows):
+    """Validate raw rows in bulk and return a float matrix of shape (n, 7)"""
+    matrix, errors = validate_feature_rows(rows)
+    if errors:
+        raise FeatureValidationError('Invalid feature rows', errors)
+    return matrix
+
+
+def top_k(probabilities, k):
+    """Class indices of the k largest probabilities in each row, highest first, shape (n, k)"""
+    probabilities = np.atleast_2d(probabilities)
+    k = max(1, min(k, probabilities.shape[1]))
+    candidates = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(probabilities, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def iter_chunks(features, chunk_size):
+    """Yield consecutive row slices of at most chunk_size rows"""
+    for start in range(0, len(features), chunk_size):
+        yield features[start:start + chunk_size]
+
+
+def predict_batch(model, features, chunk_size=5000):
+    """Score a feature matrix with one predict_proba call per chunk
+
+    Returns a list of crop labels and a matching list of confidences.
+    """
+    crops = []
+    confidences = []
+    classes = model.classes_
+
+    for chunk in iter_chunks(features, chunk_size):
+        probabilities = model.predict_proba(chunk)
+        best = probabilities.argmax(axis=1)
+        crops.extend(classes[best].tolist())
+        confidences.extend(probabilities[np.arange(len(best)), best].tolist())
+
+    return crops, confidences
+
+
+def iter_scored_csv(model, lines, chunk_size=1000):
+    """Score CSV lines chunk by chunk, yielding result CSV text as each chunk completes
+
+    Rows are numbered from 0 in input order; invalid rows are reported in the
+    error column instead of aborting the stream.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RESULT_COLUMNS)
+    yield buffer.getvalue()
+
+    offset = 0
+    for rows in iter_csv_row_chunks(lines, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+
+        matrix, errors = validate_feature_rows(rows)
+        row_errors = {error['row']: error['error'] for error in errors}
+        valid = np.ones(len(rows), dtype=bool)
+        valid[list(row_errors)] = False
+
+        results = iter([])
+        if valid.any():
+            results = zip(*predict_batch(model, matrix[valid], chunk_size))
+        for i in range(len(rows)):
+            if i in row_errors:
+                writer.writerow([offset + i, '', '', row_errors[i]])
+            else:
+                crop, confidence = next(results)
+                writer.writerow([offset + i, crop, round(confidence, 4), ''])
+
+        offset += len(rows)
+        yield buffer.getvalue()
@@ -0,0 +1,57 @@
+"""
+Memoized crop predictions keyed on quantized feature vectors
+
+Autofilled form posts mostly carry identical feature vectors, so repeated
+inference becomes a dictionary lookup. Features are rounded before both the
+lookup and the prediction, so a cached answer is always exactly what the
+model returns for the key it is stored under.
+"""
+
+from .cache import TTLCache
+from .config import Config
+from .model_registry import model_registry
+
+
+class PredictionCache:
+    def __init__(self, maxsize=4096, decimals=2):
+        self.decimals = decimals
+        self._cache = TTLCache(maxsize=maxsize, ttl=None)
+
+    def quantize(self, features):
+        """Round a (N, P, K, temperature, humidity, ph, rainfall) vector to the cache precision"""
+        return tuple(round(float(value), self.decimals) for value in features)
+
+    def predict(self, loaded, features):
+        """Return the crop predicted by a LoadedModel snapshot, computing it on a miss"""
+        quantized = self.quantize(features)
+        key = (loaded.version, quantized)
+
+        crop = self._cache.get(key)
+        if crop is None:
+            crop = str(loaded.model.predict([quantized])[0])
+            self._cache.set(key, crop)
+        return crop
+
+    def probabilities(self, loaded, features):
+        """Return the class probability vector for one feature vector, computing it on a miss"""
+        quantized = self.quantize(features)
+        key = ('proba', loaded.version, quantized)
+
+        probabilities = self._cache.get(key)
+        if probabilities is None:
+            probabilities = loaded.model.predict_proba([quantized])[0]
+            probabilities.flags.writeable = False
+            self._cache.set(key, probabilities)
+        return probabilities
+
+    def clear(self, loaded=None):
+        """Drop all entries; registered to run whenever a new model is loaded"""
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+# Global prediction cache, invalidated on every model reload
+prediction_cache = PredictionCache(Config.PREDICTION_CACHE_SIZE, Config.PREDICTION_CACHE_DECIMALS)
+model_registry.add_listener(prediction_cache.clear)
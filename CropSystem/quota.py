@@ -0,0 +1,125 @@
+"""
+Upstream call quotas for the Crop Recommendation System
+
+Each upstream API gets a token bucket for its per-second limit and a daily
+budget counted in the database, so every worker process draws from the same
+allowance. Calls are either user-facing or prefetch (warm_cache, background
+refreshes); prefetch calls may not dip into the share of the bucket and of
+the daily budget reserved for users. A call over its allowance raises
+QuotaExceededError at once so APIService can serve cached or fallback data
+instead of waiting on an exhausted API key.
+"""
+
+import logging
+import threading
+import time
+
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import UpstreamQuota
+from .rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+USER = 'user'
+PREFETCH = 'prefetch'
+
+
+class QuotaExceededError(Exception):
+    """Raised instead of calling an upstream that is over its rate limit or daily budget"""
+    pass
+
+
+class UpstreamQuotaManager:
+    def __init__(self, limits, burst=5, user_reserve=0.2, timer=time.monotonic, sleep=time.sleep):
+        """limits maps upstream name to (calls per second, calls per day); 0 means unlimited"""
+        self.limits = dict(limits)
+        self.user_reserve = user_reserve
+        self._sleep = sleep
+        self.buckets = {
+            upstream: TokenBucket(rate, burst, timer=timer)
+            for upstream, (rate, _) in self.limits.items()
+        }
+        # Budgets this process has already seen run out, by (upstream, priority) -> day
+        self._exhausted = {}
+        self._lock = threading.Lock()
+        self.rejected = {upstream: 0 for upstream in self.limits}
+
+    def _budget(self, upstream, priority):
+        daily = self.limits[upstream][1]
+        if priority == PREFETCH:
+            return int(daily * (1 - self.user_reserve))
+        return daily
+
+    def acquire(self, upstream, priority=USER, wait=False):
+        """Spend one call of the upstream's allowance, raising QuotaExceededError if there is none
+
+        With wait=True a rate-limited caller sleeps until a token is free;
+        an exhausted daily budget never waits.
+        """
+        if upstream not in self.limits:
+            return
+        bucket = self.buckets[upstream]
+        reserve = bucket.burst * self.user_reserve if priority == PREFETCH else 0.0
+        while not bucket.try_acquire(reserve):
+            if not wait:
+                self._reject(upstream)
+                raise QuotaExceededError(f"{upstream} rate limit reached")
+            self._sleep(bucket.wait_time(reserve))
+
+        if not self._consume_daily(upstream, priority):
+            self._reject(upstream)
+            raise QuotaExceededError(f"{upstream} daily {priority} budget used up")
+
+    def _reject(self, upstream):
+        with self._lock:
+            self.rejected[upstream] += 1
+
+    def _consume_daily(self, upstream, priority):
+        """Count one call against today's budget; False if it is used up"""
+        budget = self._budget(upstream, priority)
+        if not self.limits[upstream][1]:
+            return True
+        today = timezone.now().date()
+        if self._exhausted.get((upstream, priority)) == today:
+            return False
+
+        try:
+            for attempt in range(2):
+                updated = UpstreamQuota.objects.filter(
+                    upstream=upstream, day=today, used__lt=budget
+                ).update(used=F('used') + 1)
+                if updated:
+                    return True
+                if attempt:
+                    break
+                # Nothing updated: either today's row is missing (create it and retry) or the budget is spent
+                UpstreamQuota.objects.get_or_create(upstream=upstream, day=today)
+        except DatabaseError as e:
+            # Counting is best-effort; an unavailable database must not take the upstreams down with it
+            logger.warning(f"Could not count {upstream} call against its daily budget: {e}")
+            return True
+
+        logger.warning(f"Daily {priority} budget of {budget} calls to {upstream} used up")
+        self._exhausted[(upstream, priority)] = today
+        return False
+
+    def stats(self, upstream):
+        if upstream not in self.limits:
+            return None
+        rate, daily = self.limits[upstream]
+        try:
+            used = UpstreamQuota.objects.filter(
+                upstream=upstream, day=timezone.now().date()
+            ).values_list('used', flat=True).first() or 0
+        except DatabaseError:
+            used = None
+        return {
+            'rate_per_second': rate,
+            'tokens_available': self.buckets[upstream].available(),
+            'daily_budget': daily or None,
+            'used_today': used,
+            'rejected': self.rejected[upstream],
+        }
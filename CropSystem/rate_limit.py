@@ -0,0 +1,71 @@
+"""
+Rate limiting for calls to the upstream APIs
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls at least 1/rate seconds apart (rate <= 0: unlimited)"""
+
+    def __init__(self, rate, timer=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._timer = timer
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        """Block until the caller may make its next call"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = self._timer()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: refills at rate tokens per second up to burst (rate <= 0: unlimited)"""
+
+    def __init__(self, rate, burst=1, timer=time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = timer()
+
+    def _refill(self):
+        now = self._timer()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, reserve=0.0):
+        """Take a token without waiting, leaving at least reserve tokens behind; returns False if none is available"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens - 1 < reserve:
+                return False
+            self._tokens -= 1
+            return True
+
+    def wait_time(self, reserve=0.0):
+        """Seconds until try_acquire(reserve) could succeed"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 + reserve - self._tokens) / self.rate)
+
+    def available(self):
+        if self.rate <= 0:
+            return None
+        with self._lock:
+            self._refill()
+            return self._tokens
@@ -0,0 +1,63 @@
+"""
+Ranked crop recommendations for the Crop Recommendation System
+
+One predict_proba call gives the probability of every crop; the top k are
+joined with their planting calendar and mandi prices (fetched together,
+from cache where possible) and can be re-ranked by expected revenue, i.e.
+probability x price per quintal.
+"""
+
+import asyncio
+
+from .api_services import api_service
+from .crop_knowledge import crop_knowledge
+from .prediction import top_k
+from .prediction_cache import prediction_cache
+
+RANK_BY_PROBABILITY = 'probability'
+RANK_BY_REVENUE = 'revenue'
+RANKINGS = (RANK_BY_PROBABILITY, RANK_BY_REVENUE)
+
+
+def _candidates(loaded, features, k, rank_by):
+    """The k most likely (crop, probability) pairs for a feature vector"""
+    if rank_by not in RANKINGS:
+        raise ValueError(f"rank_by must be one of {', '.join(RANKINGS)}")
+
+    probabilities = prediction_cache.probabilities(loaded, features)
+    indices = top_k(probabilities, k)[0]
+    # Crops no tree voted for are not real alternatives
+    indices = [i for i in indices if probabilities[i] > 0] or indices[:1]
+    return [(str(loaded.model.classes_[i]), float(probabilities[i])) for i in indices]
+
+
+def _ranked(candidates, prices, rank_by):
+    recommendations = []
+    for (crop, probability), price_info in zip(candidates, prices):
+        recommendations.append({
+            'crop': crop,
+            'probability': round(probability, 4),
+            'expected_revenue': round(probability * float(price_info.get('price_per_quintal') or 0), 2),
+            'timing': crop_knowledge.calendar(crop),
+            'prices': price_info
+        })
+
+    if rank_by == RANK_BY_REVENUE:
+        recommendations.sort(key=lambda item: item['expected_revenue'], reverse=True)
+    for rank, item in enumerate(recommendations, 1):
+        item['rank'] = rank
+    return recommendations
+
+
+def recommend(loaded, features, k=3, rank_by=RANK_BY_PROBABILITY):
+    """Return the k most likely crops for a feature vector, with timing, prices and expected revenue"""
+    candidates = _candidates(loaded, features, k, rank_by)
+    prices = api_service.get_bulk_mandi_prices([crop for crop, _ in candidates])
+    return _ranked(candidates, prices, rank_by)
+
+
+async def arecommend(loaded, features, k=3, rank_by=RANK_BY_PROBABILITY):
+    """Async recommend: candidate prices are awaited together on the event loop"""
+    candidates = _candidates(loaded, features, k, rank_by)
+    prices = await asyncio.gather(*(api_service.aget_mandi_prices(crop) for crop, _ in candidates))
+    return _ranked(candidates, prices, rank_by)
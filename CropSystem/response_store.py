@@ -0,0 +1,104 @@
+"""
+Persistent upstream response store for the Crop Recommendation System
+
+Weather, geocoding, soil and mandi responses are kept in the database so
+restarts and new workers start warm. Each entry records when it was fetched
+and until when it is fresh; past that it may still be served for
+max_stale_age seconds while APIService refreshes it in the background.
+Entries too old even for that are purged every purge_every writes (and by
+warm_cache), so the table does not grow with every location ever typed.
+The store is best-effort: database errors are logged and treated as misses.
+"""
+
+import json
+import logging
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import UpstreamResponse
+
+logger = logging.getLogger(__name__)
+
+StoredResponse = namedtuple('StoredResponse', ['value', 'fetched_at', 'fresh_for'])
+
+
+def store_key(key):
+    """Serialize a cache key (a string or a tuple such as rounded coordinates) for the key column"""
+    return key if isinstance(key, str) else json.dumps(key)
+
+
+class ResponseStore:
+    def __init__(self, ttls, max_stale_age=86400, purge_every=1000):
+        self.ttls = dict(ttls)
+        self.max_stale_age = max_stale_age
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        """Return a StoredResponse (fresh_for <= 0 means stale), or None if missing or too old"""
+        now = timezone.now()
+        try:
+            entry = UpstreamResponse.objects.filter(
+                namespace=namespace, key=store_key(key), stale_until__gt=now
+            ).only('payload', 'fetched_at', 'fresh_until').first()
+        except DatabaseError as e:
+            logger.debug(f"Response store unavailable: {e}")
+            return None
+
+        if entry is None:
+            return None
+        return StoredResponse(entry.payload, entry.fetched_at, (entry.fresh_until - now).total_seconds())
+
+    def set(self, namespace, key, value):
+        self.set_many(namespace, {key: value})
+
+    def set_many(self, namespace, items):
+        """Upsert {key: value} responses for one namespace in a single query"""
+        now = timezone.now()
+        fresh_until = now + timedelta(seconds=self.ttls[namespace])
+        stale_until = fresh_until + timedelta(seconds=self.max_stale_age)
+        rows = [
+            UpstreamResponse(
+                namespace=namespace, key=store_key(key), payload=value,
+                fetched_at=now, fresh_until=fresh_until, stale_until=stale_until
+            )
+            for key, value in items.items()
+        ]
+        try:
+            UpstreamResponse.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['namespace', 'key'],
+                update_fields=['payload', 'fetched_at', 'fresh_until', 'stale_until']
+            )
+        except DatabaseError as e:
+            logger.warning(f"Could not persist {len(rows)} {namespace} responses: {e}")
+            return
+
+        if self._purge_due(len(rows)):
+            self.purge()
+
+    def _purge_due(self, writes):
+        """Count writes, returning True once every purge_every of them (never if purge_every is 0)"""
+        if not self.purge_every:
+            return False
+        with self._lock:
+            self._writes += writes
+            if self._writes < self.purge_every:
+                return False
+            self._writes = 0
+            return True
+
+    def purge(self):
+        """Delete entries too old to be served even as stale; returns the number removed"""
+        try:
+            deleted, _ = UpstreamResponse.objects.filter(stale_until__lte=timezone.now()).delete()
+        except DatabaseError as e:
+            logger.warning(f"Could not purge the response store: {e}")
+            return 0
+        return deleted
@@ -0,0 +1,99 @@
+"""
+Request coalescing for upstream API calls
+
+Concurrent calls with the same key share one execution: the first caller
+runs the function and everyone who arrives while it is in flight waits for
+it and receives the same result, or has the same exception raised.
+"""
+
+import asyncio
+import threading
+import weakref
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, func, *args, wait_timeout=None, **kwargs):
+        """Run func unless a call with the same key is already in flight, then share its outcome
+
+        A caller that finds the call in flight waits at most wait_timeout
+        seconds for it, then raises TimeoutError.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+                self.executions += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(wait_timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight call {key!r}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._flights)
+        return {
+            'in_flight': in_flight,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+        }
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines; calls are only coalesced within one event loop"""
+
+    def __init__(self):
+        self._flights = weakref.WeakKeyDictionary()
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, func, *args, **kwargs):
+        """Await func unless a call with the same key is already in flight, then share its outcome"""
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        task = flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            flights[key] = task
+            task.add_done_callback(lambda _: flights.pop(key, None))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        # Shielded so one cancelled waiter does not cancel the request for everyone else
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            'in_flight': sum(len(flights) for flights in list(self._flights.values())),
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+        }
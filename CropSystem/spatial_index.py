@@ -0,0 +1,150 @@
+"""
+Spatial nearest-neighbour index over known Gujarat coordinates
+
+Points are stored as unit vectors on the sphere in a KD-tree, so nearest
+district, nearest APMC market and region lookups are O(log n) and work for
+single coordinates or whole arrays of them. Whether a point is in Gujarat
+at all is decided by the state outline, not by distance to a district.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .gujarat_config import (
+    GUJARAT_APMC_MARKETS, GUJARAT_BOUNDARY, GUJARAT_DISTRICT_COORDINATES, GUJARAT_REGIONS,
+    GUJARAT_SOIL_CHARACTERISTICS
+)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def to_unit_vectors(lats, lons):
+    """Convert degrees of latitude/longitude to 3D unit vectors"""
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.stack([
+        np.cos(lats) * np.cos(lons),
+        np.cos(lats) * np.sin(lons),
+        np.sin(lats)
+    ], axis=-1)
+
+
+def chord_to_km(chord):
+    """Great-circle distance in km for a straight-line distance between unit vectors"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def in_polygon(lats, lons, polygon):
+    """Vectorized even-odd test of points against a polygon of (lat, lon) vertices"""
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))[:, None]
+    lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))[:, None]
+    vertices = np.asarray(polygon, dtype=np.float64)
+    lat1, lon1 = vertices[:, 0], vertices[:, 1]
+    lat2, lon2 = np.roll(lat1, -1), np.roll(lon1, -1)
+
+    spans = (lat1 > lats) != (lat2 > lats)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_lons = lon1 + (lats - lat1) * (lon2 - lon1) / (lat2 - lat1)
+    return np.count_nonzero(spans & (lons < crossing_lons), axis=1) % 2 == 1
+
+
+class SpatialIndex:
+    """KD-tree over named points; each point carries an arbitrary payload dict"""
+
+    def __init__(self, points):
+        self.payloads = [payload for payload, _, _ in points]
+        lats = [lat for _, lat, _ in points]
+        lons = [lon for _, _, lon in points]
+        self._tree = cKDTree(to_unit_vectors(lats, lons))
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def query(self, lats, lons, k=1):
+        """Vectorized lookup returning (indices, distances_km), each shaped (n,) or (n, k)"""
+        chords, indices = self._tree.query(to_unit_vectors(lats, lons), k=k)
+        return indices, chord_to_km(chords)
+
+    def nearest(self, lat, lon, k=1):
+        """The k closest payloads to one point (all of them if there are fewer), each with a distance_km key"""
+        # cKDTree pads missing neighbours with index len(self), so never ask for more than there are
+        indices, distances = self.query([lat], [lon], k=min(k, len(self)))
+        indices, distances = np.atleast_1d(indices[0]), np.atleast_1d(distances[0])
+        return [
+            dict(self.payloads[i], distance_km=round(float(d), 2))
+            for i, d in zip(indices, distances)
+        ]
+
+
+class GujaratLocator:
+    """Maps coordinates to districts, regions, soil types and APMC markets"""
+
+    def __init__(self, boundary=GUJARAT_BOUNDARY):
+        self.boundary = boundary
+
+        district_regions = {}
+        for region, info in GUJARAT_REGIONS.items():
+            for district in info['districts']:
+                district_regions[district] = region
+
+        region_soils = {}
+        for soil_type, info in GUJARAT_SOIL_CHARACTERISTICS.items():
+            for region in info['regions']:
+                region_soils.setdefault(region, soil_type)
+        self._region_soils = region_soils
+
+        self.districts = SpatialIndex([
+            ({'district': district, 'region': district_regions.get(district), 'lat': coords['lat'], 'lon': coords['lon']},
+             coords['lat'], coords['lon'])
+            for district, coords in GUJARAT_DISTRICT_COORDINATES.items()
+        ])
+
+        markets = []
+        for key, market in GUJARAT_APMC_MARKETS.items():
+            coords = GUJARAT_DISTRICT_COORDINATES.get(key.title())
+            if coords:
+                markets.append((
+                    {'market': market['name'], 'district': key.title(), 'lat': coords['lat'], 'lon': coords['lon']},
+                    coords['lat'], coords['lon']
+                ))
+        self.markets = SpatialIndex(markets)
+
+    def nearest_district(self, lat, lon):
+        return self.districts.nearest(lat, lon)[0]
+
+    def nearest_market(self, lat, lon, k=1):
+        return self.markets.nearest(lat, lon, k=k)
+
+    def contains(self, lat, lon):
+        """Whether the point lies within Gujarat's outline"""
+        return bool(in_polygon(lat, lon, self.boundary)[0])
+
+    def region_for(self, lat, lon):
+        """Agricultural region of the nearest district, or None if the point is outside Gujarat"""
+        if not self.contains(lat, lon):
+            return None
+        return self.nearest_district(lat, lon)['region']
+
+    def soil_type_for(self, lat, lon):
+        """Key into GUJARAT_SOIL_CHARACTERISTICS for the point's region (None if unknown)"""
+        return self._region_soils.get(self.region_for(lat, lon))
+
+    def nearest_districts(self, lats, lons):
+        """Vectorized nearest-district lookup for arrays of coordinates"""
+        indices, distances = self.districts.query(lats, lons)
+        return [
+            dict(self.districts.payloads[i], distance_km=round(float(d), 2))
+            for i, d in zip(np.atleast_1d(indices), np.atleast_1d(distances))
+        ]
+
+    def regions_for(self, lats, lons):
+        """Vectorized region lookup for arrays of coordinates (None outside Gujarat)"""
+        indices, _ = self.districts.query(lats, lons)
+        return [
+            self.districts.payloads[i]['region'] if inside else None
+            for i, inside in zip(np.atleast_1d(indices), in_polygon(lats, lons, self.boundary))
+        ]
+
+
+# Global locator, built once at import
+gujarat_locator = GujaratLocator()
@@ -1,3 +1,1201 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import pickle
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+import pandas as pd
+import requests
+from sklearn.ensemble import RandomForestClassifier
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .api_services import APIService, UpstreamError, api_service, is_upstream_failure
+from .cache import TTLCache
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from .config import Config
+from .crop_knowledge import crop_knowledge, month_window
+from .deadline import Deadline, DeadlineExceeded, use_deadline
+from .forest_engine import ESTIMATOR_MIN_ROWS, compile_forest, load_forest, save_forest
+from .gujarat_config import GUJARAT_DISTRICT_COORDINATES, GUJARAT_REGIONS
+from .location_index import location_index
+from .model_registry import LoadedModel, ModelRegistry, model_registry
+from .models import UpstreamQuota, UpstreamResponse
+from .prediction import FEATURE_COLUMNS, RESULT_COLUMNS
+from .prediction_cache import PredictionCache, prediction_cache
+from .quota import PREFETCH, USER, QuotaExceededError, UpstreamQuotaManager
+from .rate_limit import TokenBucket
+from .response_store import ResponseStore, StoredResponse, store_key
+from .singleflight import SingleFlight
+from .spatial_index import gujarat_locator
+
+MODEL_PATH = Path(settings.BASE_DIR) / 'crop_model.pkl'
+DATASET_PATH = Path(__file__).resolve().parent / 'ML' / 'Crop_recommendation.csv'
+
+
+class PredictBatchTests(SimpleTestCase):
+    """/api/predict-batch/ scores JSON or CSV rows in one call"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dataset = pd.read_csv(DATASET_PATH)
+        cls.loaded = model_registry.current()
+
+    def post(self, body, content_type='application/json'):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        return self.client.post('/api/predict-batch/', body, content_type=content_type)
+
+    def test_json_rows(self):
+        sample = self.dataset.iloc[::200]
+        rows = sample[FEATURE_COLUMNS].to_dict('records')
+        rows[1] = list(rows[1].values())
+        response = self.post({'rows': rows})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['model_version'], self.loaded.version)
+        self.assertEqual(data['count'], len(sample))
+        expected = self.loaded.model.predict(sample[FEATURE_COLUMNS].to_numpy())
+        self.assertEqual([prediction['crop'] for prediction in data['predictions']], list(expected))
+
+    def test_csv_rows_with_header(self):
+        sample = self.dataset.iloc[::200]
+        response = self.post(sample[FEATURE_COLUMNS[::-1]].to_csv(index=False), 'text/csv')
+        self.assertEqual(response.status_code, 200)
+        expected = self.loaded.model.predict(sample[FEATURE_COLUMNS].to_numpy())
+        self.assertEqual([prediction['crop'] for prediction in response.json()['predictions']], list(expected))
+
+    def test_bad_rows_are_reported(self):
+        response = self.post([[90, 42, 43, 20.8, 82, 6.5, 202.9], [90, 42], [90, 42, 43, 'hot', 82, 6.5, 202.9]])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.json()['rows']], [1, 2])
+        self.assertEqual(self.post('{"rows": ').status_code, 400)
+        self.assertEqual(self.post({'rows': []}).status_code, 400)
+
+    def test_too_many_rows(self):
+        rows = self.dataset[FEATURE_COLUMNS].iloc[:3].to_numpy().tolist()
+        with mock.patch.object(Config, 'PREDICT_BATCH_MAX_ROWS', 2):
+            self.assertEqual(self.post(rows).status_code, 413)
+
+    def test_body_limit_follows_row_limit(self):
+        rows = self.dataset[FEATURE_COLUMNS].iloc[:50].to_numpy().tolist()
+        with override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100):
+            self.assertEqual(self.post(rows).status_code, 200)
+            with mock.patch.object(Config, 'PREDICT_BATCH_MAX_ROWS', 100), \
+                    mock.patch.object(Config, 'PREDICT_BATCH_ROW_BYTES', 10):
+                response = self.post(rows)
+        self.assertEqual(response.status_code, 413)
+
+
+class PredictUploadTests(SimpleTestCase):
+    """/api/predict-upload/ streams one result row per input row, chunk by chunk"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.sample = pd.read_csv(DATASET_PATH).iloc[::300][FEATURE_COLUMNS]
+        cls.loaded = model_registry.current()
+
+    def read_results(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Model-Version'], self.loaded.version)
+        return pd.read_csv(io.StringIO(b''.join(response.streaming_content).decode()), keep_default_na=False)
+
+    def expected_crops(self, sample):
+        return list(self.loaded.model.predict(sample.to_numpy()))
+
+    def test_csv_body_across_chunks(self):
+        with mock.patch.object(Config, 'PREDICT_STREAM_CHUNK_SIZE', 2):
+            response = self.client.post(
+                '/api/predict-upload/', self.sample.to_csv(index=False), content_type='text/csv'
+            )
+            results = self.read_results(response)
+
+        self.assertEqual(list(results.columns), RESULT_COLUMNS)
+        self.assertEqual(list(results['row']), list(range(len(self.sample))))
+        self.assertEqual(list(results['crop']), self.expected_crops(self.sample))
+        self.assertTrue(((results['confidence'] > 0) & (results['confidence'] <= 1)).all())
+        self.assertEqual(set(results['error']), {''})
+
+    def test_multipart_upload_reports_bad_rows(self):
+        lines = self.sample.to_csv(index=False, header=False).splitlines()
+        lines[1] = '90,42,43,hot,82,6.5,202.9'
+        lines.insert(3, '90,42')
+        upload = SimpleUploadedFile('fields.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        with mock.patch.object(Config, 'PREDICT_STREAM_CHUNK_SIZE', 2):
+            results = self.read_results(self.client.post('/api/predict-upload/', {'file': upload}))
+
+        self.assertEqual(list(results['row']), list(range(len(self.sample) + 1)))
+        bad = results[results['error'] != '']
+        self.assertEqual(list(bad['row']), [1, 3])
+        self.assertEqual(set(bad['crop']), {''})
+        good = self.sample.drop(self.sample.index[1])
+        self.assertEqual(list(results[results['error'] == '']['crop']), self.expected_crops(good))
+
+    def test_multipart_without_file(self):
+        response = self.client.post('/api/predict-upload/', {'other': 'value'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/predict-upload/').status_code, 405)
+
+
+class RecommendBulkTests(SimpleTestCase):
+    """recommend_bulk keeps input order and columns and marks unusable rows"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.input = Path(tmp.name) / 'plots.csv'
+        self.output = Path(tmp.name) / 'results.csv'
+
+    def run_command(self, frame):
+        frame.to_csv(self.input, index=False)
+        call_command(
+            'recommend_bulk', str(self.input), str(self.output), workers=2, chunk_size=3,
+            stdout=io.StringIO(), stderr=io.StringIO()
+        )
+        return pd.read_csv(self.output)
+
+    def test_results_keep_input_order_and_columns(self):
+        frame = pd.read_csv(DATASET_PATH).iloc[::150][FEATURE_COLUMNS].reset_index(drop=True)
+        frame.insert(0, 'plot', [f"plot-{i}" for i in range(len(frame))])
+        frame = frame.astype({'ph': object})
+        frame.loc[4, 'ph'] = 'acidic'
+        frame.loc[7, 'rainfall'] = np.nan
+
+        results = self.run_command(frame)
+        self.assertEqual(list(results.columns), ['plot'] + FEATURE_COLUMNS + ['crop', 'confidence', 'error'])
+        self.assertEqual(list(results['plot']), list(frame['plot']))
+
+        bad = results['error'].notna()
+        self.assertEqual(list(results.index[bad]), [4, 7])
+        self.assertTrue(results.loc[bad, 'crop'].isna().all())
+        good = frame.drop([4, 7])[FEATURE_COLUMNS].astype(float).to_numpy()
+        self.assertEqual(list(results.loc[~bad, 'crop']), list(model_registry.get().predict(good)))
+        self.assertTrue(results.loc[~bad, 'confidence'].between(0, 1).all())
+
+    def test_missing_feature_columns(self):
+        frame = pd.read_csv(DATASET_PATH).iloc[:5][FEATURE_COLUMNS[:-1]]
+        with self.assertRaisesMessage(CommandError, 'rainfall'):
+            self.run_command(frame)
+
+
+class FlatForestParityTests(SimpleTestCase):
+    """The flattened engine must reproduce the sklearn forest exactly"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(MODEL_PATH, 'rb') as f:
+            cls.model = pickle.load(f)
+        # Without the estimator every matrix is walked by the flat engine
+        cls.forest = compile_forest(cls.model, keep_estimator=False)
+        cls.features = pd.read_csv(DATASET_PATH)[FEATURE_COLUMNS].to_numpy()
+
+    def test_batch_predict_matches_sklearn(self):
+        expected = self.model.predict(self.features)
+        np.testing.assert_array_equal(self.forest.predict(self.features), expected)
+
+    def test_batch_predict_proba_matches_sklearn(self):
+        np.testing.assert_allclose(
+            self.forest.predict_proba(self.features), self.model.predict_proba(self.features)
+        )
+
+    def test_single_row_predict_matches_sklearn(self):
+        for row in self.features[::50]:
+            row = row.reshape(1, -1)
+            self.assertEqual(self.forest.predict(row)[0], self.model.predict(row)[0])
+
+    def test_predict_outside_training_range(self):
+        rng = np.random.default_rng(0)
+        low, high = self.features.min(axis=0), self.features.max(axis=0)
+        samples = rng.uniform(low - 10, high + 10, size=(500, len(FEATURE_COLUMNS)))
+        np.testing.assert_array_equal(self.forest.predict(samples), self.model.predict(samples))
+
+    def test_large_matrices_go_to_estimator(self):
+        forest = compile_forest(self.model)
+        self.assertGreaterEqual(len(self.features), ESTIMATOR_MIN_ROWS)
+        np.testing.assert_allclose(forest.predict_proba(self.features), self.model.predict_proba(self.features))
+        np.testing.assert_allclose(
+            forest.flat_predict_proba(self.features), self.model.predict_proba(self.features)
+        )
+
+
+class ForestArtifactTests(SimpleTestCase):
+    """A saved artifact reopens memory-mapped and predicts like the original"""
+
+    def test_save_and_load_memory_mapped(self):
+        with open(MODEL_PATH, 'rb') as f:
+            forest = compile_forest(pickle.load(f))
+        features = pd.read_csv(DATASET_PATH)[FEATURE_COLUMNS].to_numpy()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp) / 'crop_model'
+            save_forest(forest, directory)
+            save_forest(forest, directory)
+            loaded = load_forest(directory)
+
+            self.assertIsInstance(loaded.threshold, np.memmap)
+            self.assertIsNone(loaded.estimator)
+            self.assertEqual(list(directory.glob('*.pkl')), [])
+            np.testing.assert_array_equal(loaded.predict(features), forest.predict(features))
+            self.assertEqual(loaded.predict(features[:1])[0], forest.predict(features[:1])[0])
+
+    def test_loaded_forest_survives_replacement(self):
+        dataset = pd.read_csv(DATASET_PATH)
+        features = dataset[FEATURE_COLUMNS].to_numpy()
+        first = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(features, dataset['label'])
+        second = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=1).fit(features, dataset['label'])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp) / 'crop_model'
+            save_forest(compile_forest(first), directory)
+            loaded = load_forest(directory)
+            save_forest(compile_forest(second), directory)
+
+            self.assertGreaterEqual(len(features), ESTIMATOR_MIN_ROWS)
+            np.testing.assert_allclose(loaded.predict_proba(features), first.predict_proba(features))
+            np.testing.assert_allclose(loaded.predict_proba(features[:10]), first.predict_proba(features[:10]))
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """ModelRegistry swaps in a retrained artifact and tells its listeners"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        dataset = pd.read_csv(DATASET_PATH)
+        cls.features = dataset[FEATURE_COLUMNS].to_numpy()
+        cls.first, cls.second = (
+            RandomForestClassifier(n_estimators=5, max_depth=4, random_state=seed).fit(cls.features, dataset['label'])
+            for seed in (0, 1)
+        )
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name) / 'crop_model'
+        self.pickle_path = Path(tmp.name) / 'crop_model.pkl'
+        self.registry = ModelRegistry(self.directory, self.pickle_path, reload_interval=0)
+        self.loaded = []
+        self.registry.add_listener(self.loaded.append)
+
+    def test_hot_swaps_a_retrained_artifact(self):
+        save_forest(compile_forest(self.first), self.directory)
+        before = self.registry.current()
+        self.assertEqual(before.source, self.directory)
+        self.assertFalse(self.registry.reload())
+
+        save_forest(compile_forest(self.second), self.directory)
+        self.assertTrue(self.registry.reload())
+        after = self.registry.current()
+
+        self.assertNotEqual(after.version, before.version)
+        self.assertEqual(self.registry.info()['version'], after.version)
+        self.assertEqual(self.loaded, [before, after])
+        np.testing.assert_allclose(after.model.predict_proba(self.features), self.second.predict_proba(self.features))
+        np.testing.assert_allclose(before.model.predict_proba(self.features), self.first.predict_proba(self.features))
+
+    def test_broken_artifact_keeps_the_previous_model(self):
+        save_forest(compile_forest(self.first), self.directory)
+        before = self.registry.current()
+
+        (self.directory / 'threshold.npy').write_bytes(b'not an array')
+        with self.assertLogs('CropSystem.model_registry', 'ERROR'):
+            self.assertFalse(self.registry.reload())
+        self.assertIs(self.registry.current(), before)
+        self.assertEqual(self.loaded, [before])
+
+    def test_falls_back_to_the_pickle(self):
+        with self.assertLogs('CropSystem.model_registry', 'ERROR'):
+            self.assertIsNone(self.registry.get())
+        self.assertEqual(self.registry.info(), {'loaded': False, 'version': None})
+
+        with open(self.pickle_path, 'wb') as f:
+            pickle.dump(self.first, f)
+        loaded = self.registry.current()
+        self.assertEqual(loaded.source, self.pickle_path)
+        np.testing.assert_array_equal(loaded.model.predict(self.features), self.first.predict(self.features))
+
+
+class PredictionCacheTests(SimpleTestCase):
+    """Predictions are memoized per model version on rounded feature vectors"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.loaded = model_registry.current()
+        cls.row = pd.read_csv(DATASET_PATH)[FEATURE_COLUMNS].iloc[0].tolist()
+
+    def setUp(self):
+        self.cache = PredictionCache(decimals=2)
+        self.model = mock.Mock(wraps=self.loaded.model)
+        self.snapshot = LoadedModel(self.model, self.loaded.version, self.loaded.source, self.loaded.loaded_at)
+
+    def test_nearby_vectors_share_one_prediction(self):
+        crop = self.cache.predict(self.snapshot, self.row)
+        self.assertEqual(crop, str(self.loaded.model.predict([self.row])[0]))
+        self.assertEqual(self.cache.predict(self.snapshot, [value + 0.001 for value in self.row]), crop)
+        self.model.predict.assert_called_once()
+
+        probabilities = self.cache.probabilities(self.snapshot, self.row)
+        self.assertIs(self.cache.probabilities(self.snapshot, self.row), probabilities)
+        self.assertFalse(probabilities.flags.writeable)
+        self.model.predict_proba.assert_called_once()
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_new_model_version_misses(self):
+        self.cache.predict(self.snapshot, self.row)
+        retrained = LoadedModel(self.model, 'retrained', self.loaded.source, self.loaded.loaded_at)
+        self.cache.predict(retrained, self.row)
+        self.assertEqual(self.model.predict.call_count, 2)
+
+    def test_model_reload_clears_the_shared_cache(self):
+        prediction_cache.predict(self.loaded, self.row)
+        self.assertGreater(prediction_cache.stats()['size'], 0)
+        model_registry.reload(force=True)
+        self.assertEqual(prediction_cache.stats()['size'], 0)
+
+
+class CropKnowledgeTests(SimpleTestCase):
+    """The crop knowledge base answers by name, alias or Gujarati name and by month"""
+
+    def test_lookup_by_alias_and_gujarati_name(self):
+        groundnut = crop_knowledge.get('groundnut')
+        for name in ['Groundnut', ' PEANUT ', 'શેંગડા']:
+            self.assertIs(crop_knowledge.get(name), groundnut)
+        self.assertEqual(crop_knowledge.get('pearl-millet').name, 'bajra')
+        self.assertIsNone(crop_knowledge.get('dragonfruit'))
+        self.assertEqual(crop_knowledge.reference_price('paddy'), crop_knowledge.get('rice').price_per_quintal)
+        self.assertEqual(crop_knowledge.reference_price('dragonfruit'), 2500)
+
+    def test_month_windows_wrap_past_december(self):
+        self.assertEqual(month_window('November', 'February'), (11, 12, 1, 2))
+        self.assertEqual(month_window('June', 'July'), (6, 7))
+        self.assertEqual(month_window('Year-round', 'Year-round'), tuple(range(1, 13)))
+        self.assertEqual(month_window('Sometime', 'July'), ())
+
+    def test_plantable_and_harvestable_in(self):
+        self.assertIn('wheat', crop_knowledge.plantable_in('Nov'))
+        self.assertNotIn('wheat', crop_knowledge.plantable_in(6))
+        self.assertIn('rice', crop_knowledge.plantable_in('6'))
+        self.assertIn('wheat', crop_knowledge.harvestable_in('march'))
+        with self.assertRaises(ValueError):
+            crop_knowledge.plantable_in(13)
+
+    def test_crops_for_month_endpoint(self):
+        response = self.client.get('/api/crops-for-month/', {'month': 'june'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['month'], 'June')
+        self.assertEqual(response.json()['plant'], list(crop_knowledge.plantable_in(6)))
+        self.assertEqual(self.client.get('/api/crops-for-month/', {'month': 'smarch'}).status_code, 400)
+
+
+class FakeTimer:
+    """A clock that only moves when the test says so"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class NullStore:
+    """Response store that remembers nothing, keeping APIService tests off the database"""
+
+    def get(self, namespace, key):
+        return None
+
+    def set(self, namespace, key, value):
+        pass
+
+
+def build_service():
+    """An APIService with no persisted store and no quotas"""
+    return APIService(store=NullStore(), quota=UpstreamQuotaManager({}))
+
+
+def http_status_error(status_code):
+    request = httpx.Request('GET', 'https://upstream.test/')
+    return httpx.HTTPStatusError('error', request=request, response=httpx.Response(status_code, request=request))
+
+
+def mandi_price(crop_name, market=None):
+    return {'crop': crop_name, 'price_per_quintal': 2500, 'source': 'Real API'}
+
+
+class TTLCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = TTLCache(maxsize=2, ttl=60, timer=self.timer)
+
+    def test_entries_expire(self):
+        self.cache.set('wheat', 2500)
+        self.timer.advance(59)
+        self.assertEqual(self.cache.get('wheat'), 2500)
+        self.assertEqual(self.cache.expires_in('wheat'), 1)
+        self.timer.advance(1)
+        self.assertIsNone(self.cache.get('wheat'))
+        self.assertEqual(self.cache.expires_in('wheat'), 0)
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set('wheat', 1)
+        self.cache.set('rice', 2)
+        self.cache.get('wheat')
+        self.cache.set('cotton', 3)
+        self.assertIsNone(self.cache.get('rice'))
+        self.assertEqual(self.cache.get('wheat'), 1)
+        self.assertEqual(self.cache.get('cotton'), 3)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_expires_in_without_ttl(self):
+        cache = TTLCache(ttl=None, timer=self.timer)
+        cache.set('rajkot', (22.3, 70.8))
+        self.timer.advance(10 ** 6)
+        self.assertIsNone(cache.expires_in('rajkot'))
+        self.assertEqual(cache.get('rajkot'), (22.3, 70.8))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Breaker state transitions and which errors count against the upstream"""
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.breaker = CircuitBreaker(
+            'mandi', failure_threshold=3, recovery_timeout=30, timer=self.timer, is_failure=is_upstream_failure
+        )
+
+    def fail(self, error):
+        def func():
+            raise error
+        with self.assertRaises(type(error)):
+            self.breaker.call(func)
+
+    def open_breaker(self):
+        for _ in range(3):
+            self.fail(httpx.ConnectError('refused'))
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_opens_after_threshold_and_rejects_without_calling(self):
+        self.fail(httpx.ConnectError('refused'))
+        self.fail(httpx.ConnectError('refused'))
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail(httpx.ConnectError('refused'))
+        self.assertEqual(self.breaker.state, OPEN)
+
+        func = mock.Mock()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(func)
+        func.assert_not_called()
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_half_open_lets_one_probe_through_and_closes_on_success(self):
+        self.open_breaker()
+        self.timer.advance(30)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+
+    def test_failed_probe_reopens(self):
+        self.open_breaker()
+        self.timer.advance(30)
+        self.fail(http_status_error(503))
+        self.assertEqual(self.breaker.state, OPEN)
+        self.timer.advance(29)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_client_errors_do_not_open_the_circuit(self):
+        self.fail(httpx.ConnectError('refused'))
+        self.fail(httpx.ConnectError('refused'))
+        for _ in range(5):
+            self.fail(http_status_error(404))
+            self.fail(UpstreamError('no records', status_code=400))
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()['consecutive_failures'], 0)
+
+    def test_client_error_probe_closes(self):
+        self.open_breaker()
+        self.timer.advance(30)
+        self.fail(http_status_error(404))
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_cancelled_async_call_is_not_recorded_and_releases_the_probe(self):
+        self.open_breaker()
+        self.timer.advance(30)
+
+        async def cancelled_probe():
+            with self.assertRaises(TimeoutError):
+                await asyncio.wait_for(self.breaker.call_async(asyncio.sleep, 10), 0.01)
+
+        asyncio.run(cancelled_probe())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertEqual(self.breaker.stats()['consecutive_failures'], 3)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_async_failures_are_recorded(self):
+        async def failing():
+            raise httpx.ReadTimeout('slow')
+
+        async def call_three_times():
+            for _ in range(3):
+                with self.assertRaises(httpx.ReadTimeout):
+                    await self.breaker.call_async(failing)
+
+        asyncio.run(call_three_times())
+        self.assertEqual(self.breaker.state, OPEN)
+
+
+class UpstreamFailureTests(SimpleTestCase):
+    """is_upstream_failure: unhealthy upstream vs a bad request"""
+
+    def requests_http_error(self, status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        return requests.HTTPError('error', response=response)
+
+    def test_failures(self):
+        for error in [
+            http_status_error(500), http_status_error(503), http_status_error(429),
+            self.requests_http_error(502), UpstreamError('bad gateway', status_code=502),
+            UpstreamError('no status'), httpx.ConnectError('refused'), httpx.ReadTimeout('slow'),
+            requests.ConnectionError('refused'), requests.Timeout('slow'), TimeoutError(),
+        ]:
+            with self.subTest(error=repr(error)):
+                self.assertTrue(is_upstream_failure(error))
+
+    def test_not_failures(self):
+        for error in [
+            http_status_error(400), http_status_error(404), self.requests_http_error(401),
+            UpstreamError('no records', status_code=404), requests.exceptions.InvalidJSONError('not json'),
+            ValueError('bad value'), KeyError('lat'),
+        ]:
+            with self.subTest(error=repr(error)):
+                self.assertFalse(is_upstream_failure(error))
+
+
+class LocationResolutionTests(SimpleTestCase):
+    """Only exact gazetteer matches share a cache key with the place they name"""
+
+    def setUp(self):
+        self.service = build_service()
+        self.addCleanup(self.service.close)
+
+    def test_exact_ignores_filler_words_only(self):
+        self.assertEqual(location_index.exact('Rajkot district, Gujarat').name, 'Rajkot')
+        self.assertIsNone(location_index.exact('Rajkott'))
+        self.assertIsNone(location_index.exact('Kalavad road, Rajkot'))
+        self.assertEqual(location_index.resolve('Kalavad road, Rajkot').match, 'partial')
+        self.assertEqual(location_index.resolve('Rajkott').match, 'fuzzy')
+
+    def test_cache_key_is_shared_by_exact_matches_only(self):
+        self.assertEqual(self.service._location_key('Rajkot, Gujarat'), 'rajkot')
+        self.assertEqual(self.service._location_key('RAJKOT district'), 'rajkot')
+        self.assertEqual(self.service._location_key('Rajkott'), 'rajkott')
+        self.assertEqual(self.service._location_key('Kalavad road, Rajkot'), 'kalavad road, rajkot')
+
+
+class SpatialIndexTests(SimpleTestCase):
+    """Nearest district, market and region lookups, with Gujarat's outline deciding membership"""
+
+    def test_districts_map_to_themselves_and_their_region(self):
+        for region, info in GUJARAT_REGIONS.items():
+            for district in info['districts']:
+                coords = GUJARAT_DISTRICT_COORDINATES.get(district)
+                if coords is None:
+                    continue
+                with self.subTest(district=district):
+                    nearest = gujarat_locator.nearest_district(coords['lat'], coords['lon'])
+                    self.assertEqual(nearest['district'], district)
+                    self.assertEqual(nearest['distance_km'], 0)
+                    self.assertEqual(gujarat_locator.region_for(coords['lat'], coords['lon']), region)
+
+    def test_points_outside_gujarat_have_no_region(self):
+        # Udaipur is 131 km from Aravalli's headquarters, Abu Road just across the border
+        for lat, lon in [(24.58, 73.71), (24.48, 72.78), (22.77, 74.59), (19.97, 72.73), (24.36, 70.75)]:
+            with self.subTest(lat=lat, lon=lon):
+                self.assertIsNone(gujarat_locator.region_for(lat, lon))
+                self.assertIsNone(gujarat_locator.soil_type_for(lat, lon))
+        self.assertEqual(gujarat_locator.region_for(24.33, 72.85), 'north_gujarat')
+
+    def test_vectorized_lookups_match_single_lookups(self):
+        lats, lons = [22.3, 24.58, 21.17, 23.25], [70.8, 73.71, 72.83, 69.67]
+        self.assertEqual(
+            gujarat_locator.regions_for(lats, lons),
+            [gujarat_locator.region_for(lat, lon) for lat, lon in zip(lats, lons)]
+        )
+        self.assertEqual(
+            gujarat_locator.nearest_districts(lats, lons),
+            [gujarat_locator.nearest_district(lat, lon) for lat, lon in zip(lats, lons)]
+        )
+
+    def test_nearest_markets_are_capped_at_the_number_known(self):
+        markets = gujarat_locator.nearest_market(22.3, 70.8, k=100)
+        self.assertEqual(len(markets), len(gujarat_locator.markets))
+        self.assertEqual(markets[0]['market'], 'APMC Rajkot')
+        distances = [market['distance_km'] for market in markets]
+        self.assertEqual(distances, sorted(distances))
+
+
+class GeocodingTests(SimpleTestCase):
+    """Only exact gazetteer matches skip upstream geocoding, and only Gujarat places are remembered"""
+
+    def setUp(self):
+        self.service = build_service()
+        self.addCleanup(self.service.close)
+
+    def test_exact_match_skips_geocoding(self):
+        fetch = mock.Mock()
+        with mock.patch.object(self.service, '_fetch_location_coordinates', fetch):
+            coords = self.service.get_location_coordinates('Rajkot district')
+        fetch.assert_not_called()
+        place = location_index.exact('Rajkot')
+        self.assertEqual(coords, {'lat': place.lat, 'lon': place.lon})
+
+    def test_partial_match_is_geocoded(self):
+        place = {'name': 'Udaipur', 'state': 'Rajasthan', 'lat': 24.58, 'lon': 73.71}
+        with mock.patch.object(self.service, '_fetch_location_coordinates', return_value=place) as fetch, \
+                mock.patch.object(location_index, 'remember') as remember:
+            coords = self.service.get_location_coordinates('Udaipur, Rajkot')
+        fetch.assert_called_once_with('Udaipur, Rajkot')
+        remember.assert_not_called()
+        self.assertEqual(coords, {'lat': 24.58, 'lon': 73.71})
+
+    def test_remembers_gujarat_places_under_the_geocoder_name(self):
+        place = {'name': 'Kalavad Road', 'state': 'Gujarat', 'lat': 22.28, 'lon': 70.77}
+        district = gujarat_locator.nearest_district(22.28, 70.77)['district']
+        with mock.patch.object(location_index, 'remember') as remember:
+            self.service._remember_place(place)
+            self.service._remember_place(dict(place, state='Rajasthan'))
+            self.service._remember_place(dict(place, name=None))
+            self.service._remember_place(None)
+        remember.assert_called_once_with('Kalavad Road', district, 22.28, 70.77)
+
+
+class WarmCacheTests(TestCase):
+    """warm_cache prefetches into the shared response store"""
+
+    def test_runs_without_a_model(self):
+        fetch = mock.Mock(side_effect=mandi_price)
+        stdout = io.StringIO()
+        with mock.patch.object(model_registry, 'get', return_value=None), \
+                mock.patch.object(api_service, 'weather_api_key', 'YOUR_OPENWEATHER_API_KEY'), \
+                mock.patch.object(api_service, '_fetch_mandi_prices', fetch):
+            self.addCleanup(api_service.cache.clear, 'mandi')
+            call_command('warm_cache', rate=0, stdout=stdout)
+
+        crops = crop_knowledge.names
+        self.assertEqual(sorted(call.args[0] for call in fetch.call_args_list), sorted(crops))
+        self.assertIn(f"mandi: {len(crops)} fetched, 0 failed", stdout.getvalue())
+        self.assertEqual(UpstreamResponse.objects.filter(namespace='mandi').count(), len(crops))
+
+
+class ResponseStoreTests(TestCase):
+    """Stored responses go from fresh to stale to gone, and expired ones are purged as writes come in"""
+
+    def setUp(self):
+        self.store = ResponseStore({'mandi': 60}, max_stale_age=60, purge_every=3)
+
+    def expire(self, key, fresh_until, stale_until):
+        UpstreamResponse.objects.filter(namespace='mandi', key=store_key(key)).update(
+            fresh_until=fresh_until, stale_until=stale_until
+        )
+
+    def test_entry_is_fresh_then_stale_then_gone(self):
+        now = timezone.now()
+        self.store.set('mandi', 'wheat', mandi_price('wheat'))
+        stored = self.store.get('mandi', 'wheat')
+        self.assertEqual(stored.value, mandi_price('wheat'))
+        self.assertGreater(stored.fresh_for, 0)
+
+        self.expire('wheat', now - timedelta(seconds=1), now + timedelta(seconds=60))
+        stored = self.store.get('mandi', 'wheat')
+        self.assertEqual(stored.value, mandi_price('wheat'))
+        self.assertLessEqual(stored.fresh_for, 0)
+
+        self.expire('wheat', now - timedelta(seconds=61), now - timedelta(seconds=1))
+        self.assertIsNone(self.store.get('mandi', 'wheat'))
+
+    def test_expired_entries_are_purged_every_n_writes(self):
+        now = timezone.now()
+        self.store.set('mandi', 'wheat', mandi_price('wheat'))
+        self.expire('wheat', now - timedelta(seconds=61), now - timedelta(seconds=1))
+
+        self.store.set('mandi', 'rice', mandi_price('rice'))
+        self.assertTrue(UpstreamResponse.objects.filter(key='wheat').exists())
+        self.store.set_many('mandi', {'cotton': mandi_price('cotton'), ('maize', 'rajkot'): mandi_price('maize')})
+        self.assertFalse(UpstreamResponse.objects.filter(key='wheat').exists())
+        self.assertEqual(UpstreamResponse.objects.count(), 3)
+
+    def test_zero_purge_every_never_purges(self):
+        store = ResponseStore({'mandi': 60}, purge_every=0)
+        with mock.patch.object(store, 'purge') as purge:
+            for crop in ['wheat', 'rice', 'cotton']:
+                store.set('mandi', crop, mandi_price(crop))
+        purge.assert_not_called()
+
+
+class StaleStore(NullStore):
+    """Response store holding one stale mandi price per crop, recording what gets written back"""
+
+    def __init__(self):
+        self.writes = []
+
+    def get(self, namespace, key):
+        return StoredResponse(mandi_price(key) | {'source': 'Stored'}, timezone.now(), -10)
+
+    def set(self, namespace, key, value):
+        self.writes.append((namespace, key, value))
+
+
+class StaleWhileRevalidateTests(SimpleTestCase):
+    """Stale stored responses are served at once while one background fetch refreshes them"""
+
+    def test_stale_response_is_served_while_one_refresh_runs(self):
+        store = StaleStore()
+        service = APIService(store=store, quota=UpstreamQuotaManager({}))
+        self.addCleanup(service.close)
+        started, release = threading.Event(), threading.Event()
+
+        def fetch(crop_name, market=None):
+            started.set()
+            release.wait(5)
+            return mandi_price(crop_name)
+
+        fetch = mock.Mock(side_effect=fetch)
+        with mock.patch.object(service, '_fetch_mandi_prices', fetch):
+            for _ in range(3):
+                self.assertEqual(service.get_mandi_prices('wheat')['source'], 'Stored')
+            self.assertTrue(started.wait(5))
+            release.set()
+            service.executor.shutdown(wait=True)
+
+        fetch.assert_called_once_with('wheat', None)
+        self.assertEqual(service.cache.get('mandi', 'wheat'), mandi_price('wheat'))
+        self.assertEqual(store.writes, [('mandi', 'wheat', mandi_price('wheat'))])
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'prices'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do('wheat', fetch)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flights.do('wheat', fetch))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        while flights.stats()['coalesced'] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(results, ['prices'] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats(), {'in_flight': 0, 'executions': 1, 'coalesced': 3})
+
+    def test_waiter_gives_up_after_wait_timeout(self):
+        flights = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def fetch():
+            started.set()
+            release.wait(5)
+
+        leader = threading.Thread(target=flights.do, args=('wheat', fetch))
+        leader.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(TimeoutError):
+                flights.do('wheat', fetch, wait_timeout=0.01)
+        finally:
+            release.set()
+            leader.join(5)
+
+
+class BulkMandiPriceTests(SimpleTestCase):
+    """get_bulk_mandi_prices fetches each distinct crop once"""
+
+    def setUp(self):
+        self.service = build_service()
+        self.addCleanup(self.service.close)
+
+    def test_bulk_prices_deduplicate_and_count_misses_once(self):
+        fetch = mock.Mock(side_effect=mandi_price)
+        with mock.patch.object(self.service, '_fetch_mandi_prices', fetch):
+            prices = self.service.get_bulk_mandi_prices(['Wheat', 'rice', 'wheat ', 'Cotton', 'Maize', 'RICE'])
+            self.assertEqual([price['crop'] for price in prices], ['Wheat', 'rice', 'Cotton', 'Maize'])
+            self.assertEqual(fetch.call_count, 4)
+            self.assertEqual(self.service.cache.stats()['mandi']['misses'], 4)
+
+            self.service.get_bulk_mandi_prices(['wheat', 'rice'])
+        self.assertEqual(fetch.call_count, 4)
+        self.assertEqual(self.service.cache.stats()['mandi']['hits'], 2)
+
+
+class TopRecommendationsTests(SimpleTestCase):
+    """/api/top-recommendations/ ranks the top k crops from one predict_proba call"""
+
+    features = {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.9, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9}
+
+    def post(self, data):
+        prices = {'rice': 1000, 'jute': 5000, 'maize': 2000}
+
+        def get_bulk_mandi_prices(crops, markets=None):
+            return [{'crop': crop, 'price_per_quintal': prices.get(crop, 100)} for crop in crops]
+
+        with mock.patch.object(api_service, 'get_bulk_mandi_prices', side_effect=get_bulk_mandi_prices):
+            return self.client.post('/api/top-recommendations/', json.dumps(data), content_type='application/json')
+
+    def test_ranked_by_probability(self):
+        data = self.post(dict(self.features, k=3)).json()
+        recommendations = data['recommendations']
+        self.assertLessEqual(len(recommendations), 3)
+        self.assertEqual(recommendations[0]['crop'], model_registry.get().predict(
+            np.array([[self.features[column] for column in FEATURE_COLUMNS]])
+        )[0])
+        probabilities = [item['probability'] for item in recommendations]
+        self.assertEqual(probabilities, sorted(probabilities, reverse=True))
+        self.assertEqual(data['model_version'], model_registry.version)
+
+    def test_ranked_by_revenue(self):
+        recommendations = self.post(dict(self.features, k=5, rank_by='revenue')).json()['recommendations']
+        revenues = [item['expected_revenue'] for item in recommendations]
+        self.assertEqual(revenues, sorted(revenues, reverse=True))
+        self.assertEqual([item['rank'] for item in recommendations], list(range(1, len(recommendations) + 1)))
+        for item in recommendations:
+            self.assertAlmostEqual(
+                item['expected_revenue'], item['probability'] * item['prices']['price_per_quintal'], delta=0.5
+            )
+
+    def test_bad_requests(self):
+        for body in [[list(self.features.values())], dict(self.features, k=0), dict(self.features, k=Config.RECOMMEND_MAX_K + 1),
+                     dict(self.features, N='lots')]:
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+    def test_top_k_limit_follows_setting(self):
+        with mock.patch.object(Config, 'RECOMMEND_MAX_K', 7):
+            response = self.client.get('/')
+        self.assertContains(response, 'name="top_k" id="top_k" class="form-control" min="1" max="7"')
+
+
+class AsyncServiceTests(SimpleTestCase):
+    """Async upstream lookups run on the service loop and keep their database calls off the upstream pool"""
+
+    def setUp(self):
+        self.service = build_service()
+        self.addCleanup(self.service.close)
+
+    def test_database_calls_do_not_wait_for_busy_upstream_workers(self):
+        threads = []
+
+        class RecordingStore(NullStore):
+            def get(self, namespace, key):
+                threads.append(threading.current_thread().name)
+
+        self.service.store = RecordingStore()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        for _ in range(Config.UPSTREAM_WORKERS):
+            self.service._submit(release.wait, 10)
+
+        with mock.patch.object(self.service, '_afetch_mandi_prices', mock.AsyncMock(side_effect=mandi_price)):
+            prices = asyncio.run(asyncio.wait_for(self.service.aget_mandi_prices('wheat'), 5))
+        self.assertEqual(prices['source'], 'Real API')
+        self.assertTrue(threads[0].startswith('upstream-db'))
+
+
+class ResolveLocationTests(SimpleTestCase):
+    """/api/resolve-location/ for places the gazetteer does not know"""
+
+    def resolve(self, location, coords):
+        geocode = mock.AsyncMock(return_value=coords)
+        with mock.patch.object(api_service, 'aget_location_coordinates', geocode):
+            response = self.client.post(
+                '/api/resolve-location/', json.dumps({'location': location}), content_type='application/json'
+            )
+        geocode.assert_awaited_once_with(location)
+        return response
+
+    def test_unknown_place_is_not_found(self):
+        response = self.resolve('Xyzzyplace', None)
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('Xyzzyplace', response.json()['error'])
+
+    def test_geocoded_place_outside_gujarat_has_no_district_or_region(self):
+        response = self.resolve('Udaipur, Rajasthan', {'lat': 24.58, 'lon': 73.71})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIsNone(data['district'])
+        self.assertIsNone(data['region'])
+        self.assertEqual((data['lat'], data['lon']), (24.58, 73.71))
+
+    def test_geocoded_place_in_gujarat(self):
+        data = self.resolve('Kalavad Road', {'lat': 22.28, 'lon': 70.77}).json()
+        self.assertEqual((data['district'], data['region']), ('Rajkot', 'saurashtra'))
+        self.assertEqual(data['match'], 'geocoded')
+
+
+class RecommendViewTests(SimpleTestCase):
+    """/api/recommend/: location data, prediction, timing and prices in one round-trip"""
+
+    weather = {'temperature': 20.9, 'humidity': 82.0, 'rainfall': 202.9}
+    soil = {'N': 90.0, 'P': 42.0, 'K': 43.0, 'ph': 6.5, 'source': 'Sample data'}
+
+    def setUp(self):
+        self.location_data = mock.AsyncMock(return_value=(self.weather, {'lat': 22.3, 'lon': 70.8}, self.soil))
+        prices = mock.AsyncMock(side_effect=mandi_price)
+        for name, stub in [('aget_location_data', self.location_data), ('aget_mandi_prices', prices)]:
+            patcher = mock.patch.object(api_service, name, stub)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, data):
+        return self.client.post('/api/recommend/', json.dumps(data), content_type='application/json')
+
+    def expected_crop(self, values):
+        features = np.array([[values[column] for column in FEATURE_COLUMNS]])
+        return model_registry.get().predict(features)[0]
+
+    def test_recommends_from_location_data(self):
+        response = self.post({'location': 'Rajkot'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.location_data.assert_awaited_once_with('Rajkot', weather=True, soil=True)
+        values = {**self.soil, **self.weather}
+        self.assertEqual(data['features'], {column: values[column] for column in FEATURE_COLUMNS})
+        self.assertEqual(data['crop'], self.expected_crop(values))
+        self.assertEqual(data['prices']['crop'], data['crop'])
+        self.assertEqual(data['model_version'], model_registry.version)
+        self.assertIsNone(data['recommendations'])
+
+    def test_supplied_features_skip_lookups(self):
+        values = {'N': 20, 'P': 130, 'K': 200, 'temperature': 22.0, 'humidity': 92.0, 'ph': 5.9, 'rainfall': 110.0}
+        data = self.post(dict(values, location='Rajkot')).json()
+        self.location_data.assert_awaited_once_with('Rajkot', weather=False, soil=False)
+        self.assertEqual(data['features'], values)
+        self.assertEqual(data['crop'], self.expected_crop(values))
+
+    def test_k_returns_ranked_alternatives(self):
+        data = self.post({'location': 'Rajkot', 'k': 3}).json()
+        recommendations = data['recommendations']
+        self.assertEqual([item['rank'] for item in recommendations], list(range(1, len(recommendations) + 1)))
+        self.assertEqual(recommendations[0]['crop'], data['crop'])
+        probabilities = [item['probability'] for item in recommendations]
+        self.assertEqual(probabilities, sorted(probabilities, reverse=True))
+
+    def test_bad_requests(self):
+        for body in [['Rajkot'], 'Rajkot', {}, {'location': 'Rajkot', 'k': 0}, {'location': 'Rajkot', 'rank_by': 'luck'}]:
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+
+class HttpCachingTests(SimpleTestCase):
+    """ETag, conditional GET and max-age on the crop price endpoint"""
+
+    def test_get_returns_etag_and_not_modified(self):
+        fetch = mock.AsyncMock(side_effect=mandi_price)
+        with mock.patch.object(api_service, 'store', NullStore()), \
+                mock.patch.object(api_service, '_afetch_mandi_prices', fetch):
+            api_service.cache.clear('mandi')
+            self.addCleanup(api_service.cache.clear, 'mandi')
+            response = self.client.get('/api/get-crop-prices/', {'crop': 'wheat'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['source'], 'Real API')
+            self.assertIn('max-age=', response['Cache-Control'])
+            self.assertNotIn(f"max-age={Config.HTTP_FALLBACK_MAX_AGE}", response['Cache-Control'])
+
+            response = self.client.get(
+                '/api/get-crop-prices/', {'crop': 'wheat'}, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        fetch.assert_awaited_once()
+
+    def test_fallback_prices_get_a_short_max_age(self):
+        fetch = mock.AsyncMock(side_effect=httpx.ConnectError('refused'))
+        breaker = CircuitBreaker('mandi', is_failure=is_upstream_failure)
+        with mock.patch.object(api_service, 'store', NullStore()), \
+                mock.patch.object(api_service, '_afetch_mandi_prices', fetch), \
+                mock.patch.dict(api_service.breakers, mandi=breaker):
+            api_service.cache.clear('mandi')
+            response = self.client.get('/api/get-crop-prices/', {'crop': 'wheat'})
+        self.assertEqual(response.json()['source'], 'Sample data')
+        self.assertIn(f"max-age={Config.HTTP_FALLBACK_MAX_AGE}", response['Cache-Control'])
+        self.assertEqual(breaker.stats()['consecutive_failures'], 1)
+
+
+class RateLimitTests(SimpleTestCase):
+    def test_token_bucket_refills_at_rate(self):
+        timer = FakeTimer()
+        bucket = TokenBucket(rate=1, burst=2, timer=timer)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        self.assertEqual(bucket.wait_time(), 1.0)
+        timer.advance(1)
+        self.assertTrue(bucket.try_acquire())
+
+    def test_prefetch_leaves_the_user_reserve(self):
+        timer = FakeTimer()
+        quota = UpstreamQuotaManager({'openweather': (1, 0)}, burst=5, user_reserve=0.2, timer=timer)
+        for _ in range(4):
+            quota.acquire('openweather', PREFETCH)
+        with self.assertRaises(QuotaExceededError):
+            quota.acquire('openweather', PREFETCH)
+        quota.acquire('openweather', USER)
+        with self.assertRaises(QuotaExceededError):
+            quota.acquire('openweather', USER)
+        self.assertEqual(quota.rejected['openweather'], 2)
+
+    def test_waiting_caller_sleeps_until_a_token_is_free(self):
+        timer = FakeTimer()
+        quota = UpstreamQuotaManager({'openweather': (1, 0)}, burst=1, user_reserve=0, timer=timer, sleep=timer.advance)
+        quota.acquire('openweather', PREFETCH, wait=True)
+        quota.acquire('openweather', PREFETCH, wait=True)
+        self.assertEqual(timer.now, 1001.0)
+
+
+class DailyQuotaTests(TestCase):
+    """Daily budgets counted in the database"""
+
+    def test_prefetch_stops_at_its_share_and_users_at_the_budget(self):
+        quota = UpstreamQuotaManager({'mandi': (0, 10)}, user_reserve=0.2)
+        for _ in range(8):
+            quota.acquire('mandi', PREFETCH)
+        with self.assertRaises(QuotaExceededError):
+            quota.acquire('mandi', PREFETCH)
+        quota.acquire('mandi', USER)
+        quota.acquire('mandi', USER)
+        with self.assertRaises(QuotaExceededError):
+            quota.acquire('mandi', USER)
+
+        stats = quota.stats('mandi')
+        self.assertEqual(stats['used_today'], 10)
+        self.assertEqual(stats['rejected'], 2)
+
+    def test_row_created_by_another_worker_is_counted(self):
+        quota = UpstreamQuotaManager({'mandi': (0, 10)})
+        get_or_create = UpstreamQuota.objects.get_or_create
+
+        def created_elsewhere_first(**kwargs):
+            UpstreamQuota.objects.create(**kwargs)
+            return get_or_create(**kwargs)
+
+        with mock.patch.object(UpstreamQuota.objects, 'get_or_create', side_effect=created_elsewhere_first):
+            quota.acquire('mandi')
+        self.assertEqual(UpstreamQuota.objects.get(upstream='mandi', day=timezone.now().date()).used, 1)
+
+    def build_service(self, daily_budget):
+        service = APIService(store=NullStore(), quota=UpstreamQuotaManager({'mandi': (0, daily_budget)}))
+        self.addCleanup(service.close)
+        self.timer = FakeTimer()
+        service.breakers['mandi'] = CircuitBreaker('mandi', failure_threshold=1, recovery_timeout=30, timer=self.timer)
+        return service
+
+    def test_open_circuit_spends_no_quota(self):
+        service = self.build_service(10)
+        service.breakers['mandi'].record_failure()
+        fetch = mock.Mock(side_effect=mandi_price)
+        with mock.patch.object(service, '_fetch_mandi_prices', fetch):
+            for _ in range(12):
+                self.assertEqual(service.get_mandi_prices('wheat')['source'], 'Sample data')
+            fetch.assert_not_called()
+            self.assertEqual(service.quota.stats('mandi')['used_today'], 0)
+
+            self.timer.advance(30)
+            self.assertEqual(service.get_mandi_prices('wheat')['source'], 'Real API')
+        self.assertEqual(service.quota.stats('mandi')['used_today'], 1)
+
+    def test_probe_refused_by_quota_is_released(self):
+        service = self.build_service(1)
+        service.quota.acquire('mandi')
+        breaker = service.breakers['mandi']
+        breaker.record_failure()
+        self.timer.advance(30)
+
+        with self.assertRaises(QuotaExceededError):
+            service.admit('mandi')
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+
+
+class DeadlineTests(SimpleTestCase):
+    """Upstream calls share the request's time budget"""
+
+    def setUp(self):
+        self.service = build_service()
+        self.addCleanup(self.service.close)
+
+    def test_timeout_is_cut_to_the_time_remaining(self):
+        timer = FakeTimer()
+        deadline = Deadline(5, min_call_time=1.0, timer=timer)
+        self.assertEqual(deadline.timeout(10), 5)
+        timer.advance(4.5)
+        self.assertEqual(deadline.timeout(10), 0.5)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check()
+
+    def test_requests_use_the_remaining_time(self):
+        request = ('mandi', 'https://upstream.test/', {'params': {}, 'timeout': 10})
+        self.assertEqual(self.service._within_deadline(request), request)
+        with use_deadline(Deadline(3)):
+            upstream, url, kwargs = self.service._within_deadline(request)
+        self.assertLessEqual(kwargs['timeout'], 3)
+        self.assertEqual(request[2]['timeout'], 10)
+
+    def test_no_time_left_serves_fallback_without_calling_upstream(self):
+        fetch = mock.Mock(side_effect=mandi_price)
+        with mock.patch.object(self.service, '_fetch_mandi_prices', fetch), use_deadline(Deadline(0.5)):
+            prices = self.service.get_mandi_prices('wheat')
+        self.assertEqual(prices['source'], 'Sample data')
+        fetch.assert_not_called()
+        self.assertIsNone(self.service.cache.get('mandi', 'wheat'))
+        self.assertEqual(self.service.breakers['mandi'].stats()['consecutive_failures'], 0)
+
+    def test_slow_async_call_serves_fallback_and_finishes_for_the_cache(self):
+        async def slow_fetch(crop_name, market=None):
+            await asyncio.sleep(0.3)
+            return mandi_price(crop_name, market)
+
+        async def fetch_prices():
+            with use_deadline(Deadline(0.1, min_call_time=0.01)):
+                return await self.service.aget_mandi_prices('wheat')
+
+        with mock.patch.object(self.service, '_afetch_mandi_prices', slow_fetch):
+            prices = asyncio.run(fetch_prices())
+            self.assertEqual(prices['source'], 'Sample data')
+            for _ in range(100):
+                if self.service.cache.get('mandi', 'wheat') is not None:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(self.service.cache.get('mandi', 'wheat')['source'], 'Real API')
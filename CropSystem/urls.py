@@ -5,4 +5,14 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('api/fetch-location-data/', views.fetch_location_data, name='fetch_location_data'),
     path('api/get-crop-prices/', views.get_crop_prices, name='get_crop_prices'),
+    path('api/resolve-location/', views.resolve_location, name='resolve_location'),
+    path('api/get-crop-prices-bulk/', views.get_bulk_crop_prices, name='get_bulk_crop_prices'),
+    path('api/recommend/', views.recommend_view, name='recommend'),
+    path('api/top-recommendations/', views.top_recommendations, name='top_recommendations'),
+    path('api/predict-batch/', views.predict_batch_view, name='predict_batch'),
+    path('api/predict-upload/', views.predict_upload, name='predict_upload'),
+    path('api/crops-for-month/', views.crops_for_month, name='crops_for_month'),
+    path('api/model-info/', views.model_info, name='model_info'),
+    path('api/cache-stats/', views.cache_stats, name='cache_stats'),
+    path('api/upstream-status/', views.upstream_status, name='upstream_status'),
 ]
@@ -1,22 +1,77 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.csrf import csrf_exempt
-import pickle
-import numpy as np
+import calendar
+import codecs
+import hashlib
 import json
+from datetime import datetime
 from .forms import CropForm
 from .api_services import api_service
+from .config import Config
+from .crop_knowledge import crop_knowledge, month_number
+from .deadline import with_deadline
+from .location_index import location_index
+from .model_registry import model_registry
+from .prediction_cache import prediction_cache
+from .prediction import (
+    FEATURE_COLUMNS, FeatureValidationError, build_feature_matrix, iter_scored_csv, parse_csv_rows, parse_json_rows,
+    predict_batch
+)
+from .recommendations import RANK_BY_PROBABILITY, arecommend, recommend
+from .spatial_index import gujarat_locator
 
-# Load your ML model
-try:
-    model = pickle.load(open('crop_model.pkl', 'rb'))
-except:
-    model = None
+# Model features filled from the soil API and from the weather API respectively
+SOIL_FEATURES = ('N', 'P', 'K', 'ph')
+WEATHER_FEATURES = ('temperature', 'humidity', 'rainfall')
 
+def cached_json_response(request, payload, max_age):
+    """JSON response with a content-derived ETag and Cache-Control, or a 304 if the client's copy is current"""
+    body = json.dumps(payload, sort_keys=True)
+    etag = quote_etag(hashlib.sha256(body.encode()).hexdigest()[:32])
+    
+    client_etags = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+    if etag in client_etags or '*' in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=int(max_age))
+    return response
+
+def http_max_age(*freshness):
+    """max-age for a response built from cached data with the given remaining freshness (seconds)"""
+    remaining = min(freshness)
+    if remaining <= 0:
+        return Config.HTTP_FALLBACK_MAX_AGE
+    return min(int(remaining), Config.HTTP_MAX_AGE)
+
+def read_body(request, max_bytes):
+    """The raw request body, or None if it is longer than max_bytes
+    
+    Reads the stream directly, so max_bytes applies instead of
+    DATA_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    if int(request.META.get('CONTENT_LENGTH') or 0) > max_bytes:
+        return None
+    body = request.read(max_bytes + 1)
+    return body if len(body) <= max_bytes else None
+
+def json_object(body):
+    """Decode a JSON request body that must be an object, raising ValueError otherwise"""
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    return data
+
+@with_deadline
 def home(request):
     """Main view for crop prediction"""
     predicted_crop = None
     crop_info = None
+    recommendations = None
     form = CropForm()
     
     if request.method == 'POST':
@@ -33,14 +88,21 @@ def home(request):
                 temperature = form.cleaned_data.get('temperature', 0)
                 humidity = form.cleaned_data.get('humidity', 0)
 
-                # Predict using model
-                if model:
-                    features = np.array([[N, P, K, temperature, humidity, ph, rainfall]])
-                    prediction = model.predict(features)
-                    predicted_crop = prediction[0]
+                # Predict using model (repeated feature vectors are served from the prediction cache)
+                loaded = model_registry.current()
+                if loaded:
+                    features = [N, P, K, temperature, humidity, ph, rainfall]
+                    predicted_crop = prediction_cache.predict(loaded, features)
                     
                     # Get additional information
                     crop_info = get_crop_additional_info(predicted_crop, location)
+                    
+                    # Ranked alternatives come from one predict_proba call, with prices fetched together
+                    top_k = form.cleaned_data.get('top_k')
+                    if top_k and top_k > 1:
+                        recommendations = recommend(
+                            loaded, features, top_k, form.cleaned_data.get('rank_by') or RANK_BY_PROBABILITY
+                        )
                 else:
                     predicted_crop = "Model not available"
 
@@ -51,31 +113,33 @@ def home(request):
     return render(request, 'index.html', {
         'form': form,
         'predicted_crop': predicted_crop,
-        'crop_info': crop_info
+        'crop_info': crop_info,
+        'recommendations': recommendations,
+        'recommend_max_k': Config.RECOMMEND_MAX_K
     })
 
 @csrf_exempt
-def fetch_location_data(request):
-    """API endpoint to fetch data for a location"""
-    if request.method == 'POST':
+@with_deadline
+async def fetch_location_data(request):
+    """API endpoint to fetch data for a location
+    
+    GET ?location=... returns the same data with an ETag and a max-age set by
+    how long the weather and soil data stay fresh, so browsers and CDNs can reuse it.
+    """
+    if request.method in ('GET', 'POST'):
         try:
-            data = json.loads(request.body)
+            data = request.GET if request.method == 'GET' else json.loads(request.body)
             location = data.get('location')
             
             if not location:
                 return JsonResponse({'error': 'Location is required'}, status=400)
             
-            # Get weather data
-            weather_data = api_service.get_weather_data(location)
+            # Weather and coordinates are fetched concurrently, soil as soon as coordinates arrive;
+            # the upstream calls are awaited, so no thread is held while they are in flight
+            weather_data, coords, soil_data = await api_service.aget_location_data(location)
             if not weather_data:
                 return JsonResponse({'error': 'Could not fetch weather data'}, status=400)
             
-            # Get coordinates for soil data
-            coords = api_service.get_location_coordinates(location)
-            soil_data = None
-            if coords:
-                soil_data = api_service.get_soil_data(coords['lat'], coords['lon'])
-            
             # Combine all data
             response_data = {
                 'weather': weather_data,
@@ -83,6 +147,11 @@ def fetch_location_data(request):
                 'coordinates': coords
             }
             
+            if request.method == 'GET':
+                freshness = [api_service.freshness('weather', location)]
+                if coords:
+                    freshness.append(api_service.freshness('soil', coords['lat'], coords['lon']))
+                return cached_json_response(request, response_data, http_max_age(*freshness))
             return JsonResponse(response_data)
             
         except Exception as e:
@@ -91,17 +160,24 @@ def fetch_location_data(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 @csrf_exempt
-def get_crop_prices(request):
-    """API endpoint to get mandi prices for a crop"""
-    if request.method == 'POST':
+@with_deadline
+async def get_crop_prices(request):
+    """API endpoint to get mandi prices for a crop
+    
+    GET ?crop=... returns the same data with an ETag and a max-age set by how
+    long the cached price stays fresh.
+    """
+    if request.method in ('GET', 'POST'):
         try:
-            data = json.loads(request.body)
+            data = request.GET if request.method == 'GET' else json.loads(request.body)
             crop_name = data.get('crop')
             
             if not crop_name:
                 return JsonResponse({'error': 'Crop name is required'}, status=400)
             
-            prices = api_service.get_mandi_prices(crop_name)
+            prices = await api_service.aget_mandi_prices(crop_name)
+            if request.method == 'GET':
+                return cached_json_response(request, prices, http_max_age(api_service.freshness('mandi', crop_name)))
             return JsonResponse(prices)
             
         except Exception as e:
@@ -109,6 +185,287 @@ def get_crop_prices(request):
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
+@csrf_exempt
+@with_deadline
+async def resolve_location(request):
+    """API endpoint resolving a place name to its district, region and coordinates"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            location = data.get('location')
+            
+            if not location:
+                return JsonResponse({'error': 'Location is required'}, status=400)
+            
+            place = location_index.resolve(location)
+            if place:
+                return JsonResponse(dict(place._asdict(), source='gazetteer'))
+            
+            # Unknown locally: geocode upstream, then place the coordinates within Gujarat
+            coords = await api_service.aget_location_coordinates(location)
+            if not coords:
+                return JsonResponse({'error': f'Location not found: {location}'}, status=404)
+            
+            # Places outside Gujarat get no Gujarat district or region
+            in_gujarat = gujarat_locator.contains(coords['lat'], coords['lon'])
+            district = gujarat_locator.nearest_district(coords['lat'], coords['lon']) if in_gujarat else None
+            return JsonResponse({
+                'name': location,
+                'district': district['district'] if district else None,
+                'region': district['region'] if district else None,
+                'lat': coords['lat'],
+                'lon': coords['lon'],
+                'match': 'geocoded',
+                'source': 'geocoding'
+            })
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+@csrf_exempt
+@with_deadline
+def get_bulk_crop_prices(request):
+    """API endpoint to get mandi prices for many crops (and optionally APMC markets) at once"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            crops = data.get('crops')
+            markets = data.get('markets') or []
+            
+            if not crops or not isinstance(crops, list):
+                return JsonResponse({'error': 'A list of crops is required'}, status=400)
+            if not isinstance(markets, list):
+                return JsonResponse({'error': 'markets must be a list'}, status=400)
+            if len(crops) * max(len(markets), 1) > Config.MANDI_BULK_MAX_LOOKUPS:
+                return JsonResponse(
+                    {'error': f"At most {Config.MANDI_BULK_MAX_LOOKUPS} crop/market lookups per request"},
+                    status=400
+                )
+            
+            try:
+                prices = api_service.get_bulk_mandi_prices(crops, markets)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            return JsonResponse({'prices': prices, 'count': len(prices)})
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+@csrf_exempt
+@with_deadline
+async def recommend_view(request):
+    """One-shot API: location (plus optional feature overrides) to crop, timing and prices
+    
+    Replaces the autofill -> form post -> render round-trips. Weather and the
+    geocoding -> soil chain are fetched concurrently, and only for features the
+    caller did not supply; with k > 1 the prices of all candidates are awaited together.
+    """
+    if request.method == 'POST':
+        try:
+            loaded = model_registry.current()
+            if not loaded:
+                return JsonResponse({'error': 'Model not available'}, status=503)
+            
+            data = json_object(request.body)
+            location = data.get('location')
+            if not location:
+                return JsonResponse({'error': 'Location is required'}, status=400)
+            
+            k = int(data.get('k', 1))
+            if not 1 <= k <= Config.RECOMMEND_MAX_K:
+                return JsonResponse({'error': f'k must be between 1 and {Config.RECOMMEND_MAX_K}'}, status=400)
+            rank_by = data.get('rank_by', RANK_BY_PROBABILITY)
+            
+            overrides = {column: data[column] for column in FEATURE_COLUMNS if data.get(column) not in (None, '')}
+            weather_data, coords, soil_data = await api_service.aget_location_data(
+                location,
+                weather=any(column not in overrides for column in WEATHER_FEATURES),
+                soil=any(column not in overrides for column in SOIL_FEATURES)
+            )
+            
+            values = {}
+            values.update({column: (soil_data or {}).get(column) for column in SOIL_FEATURES})
+            values.update({column: (weather_data or {}).get(column) for column in WEATHER_FEATURES})
+            values.update(overrides)
+            features = build_feature_matrix(parse_json_rows([values]))[0]
+            
+            recommendations = await arecommend(loaded, features, k, rank_by)
+            best = recommendations[0]
+            
+            return JsonResponse({
+                'location': location,
+                'coordinates': coords,
+                'weather': weather_data,
+                'soil': soil_data,
+                'features': dict(zip(FEATURE_COLUMNS, features.tolist())),
+                'model_version': loaded.version,
+                'crop': best['crop'],
+                'probability': best['probability'],
+                'timing': best['timing'],
+                'prices': best['prices'],
+                'recommendations': recommendations if k > 1 else None
+            })
+            
+        except FeatureValidationError as e:
+            return JsonResponse({'error': str(e), 'rows': e.errors}, status=400)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+@csrf_exempt
+@with_deadline
+def top_recommendations(request):
+    """API endpoint returning the top-k crops for one feature vector, with timing and prices"""
+    if request.method == 'POST':
+        try:
+            loaded = model_registry.current()
+            if not loaded:
+                return JsonResponse({'error': 'Model not available'}, status=503)
+            
+            data = json_object(request.body)
+            features = build_feature_matrix(parse_json_rows([data]))[0]
+            k = int(data.get('k', Config.RECOMMEND_TOP_K))
+            if not 1 <= k <= Config.RECOMMEND_MAX_K:
+                return JsonResponse({'error': f'k must be between 1 and {Config.RECOMMEND_MAX_K}'}, status=400)
+            rank_by = data.get('rank_by', RANK_BY_PROBABILITY)
+            
+            return JsonResponse({
+                'model_version': loaded.version,
+                'rank_by': rank_by,
+                'recommendations': recommend(loaded, features, k, rank_by)
+            })
+            
+        except FeatureValidationError as e:
+            return JsonResponse({'error': str(e), 'rows': e.errors}, status=400)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+@csrf_exempt
+def predict_batch_view(request):
+    """API endpoint to score many feature rows in one vectorized model call"""
+    if request.method == 'POST':
+        try:
+            loaded = model_registry.current()
+            if not loaded:
+                return JsonResponse({'error': 'Model not available'}, status=503)
+
+            max_bytes = Config.PREDICT_BATCH_MAX_ROWS * Config.PREDICT_BATCH_ROW_BYTES
+            body = read_body(request, max_bytes)
+            if body is None:
+                return JsonResponse(
+                    {'error': f'Request body is larger than {max_bytes} bytes '
+                              f'(at most {Config.PREDICT_BATCH_MAX_ROWS} rows are allowed per request)'},
+                    status=413
+                )
+
+            if 'csv' in request.content_type:
+                rows = parse_csv_rows(body.decode('utf-8'))
+            else:
+                rows = parse_json_rows(json.loads(body))
+
+            if not rows:
+                return JsonResponse({'error': 'At least one feature row is required'}, status=400)
+            if len(rows) > Config.PREDICT_BATCH_MAX_ROWS:
+                return JsonResponse(
+                    {'error': f'At most {Config.PREDICT_BATCH_MAX_ROWS} rows are allowed per request'},
+                    status=413
+                )
+
+            features = build_feature_matrix(rows)
+            crops, confidences = predict_batch(loaded.model, features, Config.PREDICT_BATCH_CHUNK_SIZE)
+
+            return JsonResponse({
+                'model_version': loaded.version,
+                'count': len(crops),
+                'predictions': [
+                    {'crop': crop, 'confidence': round(confidence, 4)}
+                    for crop, confidence in zip(crops, confidences)
+                ]
+            })
+
+        except FeatureValidationError as e:
+            return JsonResponse({'error': str(e), 'rows': e.errors}, status=400)
+        except (ValueError, UnicodeDecodeError) as e:
+            return JsonResponse({'error': f'Malformed request body: {e}'}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+@csrf_exempt
+def predict_upload(request):
+    """API endpoint that scores an uploaded CSV in chunks and streams the results back as CSV
+    
+    Accepts a multipart upload in the 'file' field or a raw text/csv body. Rows
+    are parsed and scored PREDICT_STREAM_CHUNK_SIZE at a time, so memory stays
+    flat and the first results arrive before the whole file is read.
+    """
+    if request.method == 'POST':
+        try:
+            loaded = model_registry.current()
+            if not loaded:
+                return JsonResponse({'error': 'Model not available'}, status=503)
+            
+            source = request
+            if request.content_type == 'multipart/form-data':
+                source = request.FILES.get('file')
+                if source is None:
+                    return JsonResponse({'error': "A CSV file is required in the 'file' field"}, status=400)
+            
+            lines = codecs.iterdecode(source, 'utf-8-sig', errors='replace')
+            response = StreamingHttpResponse(
+                iter_scored_csv(loaded.model, lines, Config.PREDICT_STREAM_CHUNK_SIZE),
+                content_type='text/csv'
+            )
+            response['Content-Disposition'] = 'attachment; filename="recommendations.csv"'
+            response['X-Model-Version'] = loaded.version
+            return response
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+def crops_for_month(request):
+    """API endpoint listing crops that can be planted or harvested in a month"""
+    try:
+        month = month_number(request.GET.get('month') or datetime.now().month)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'month': calendar.month_name[month],
+        'plant': list(crop_knowledge.plantable_in(month)),
+        'harvest': list(crop_knowledge.harvestable_in(month))
+    })
+
+def model_info(request):
+    """API endpoint describing the currently loaded model"""
+    model_registry.current()
+    return JsonResponse(model_registry.info())
+
+def cache_stats(request):
+    """API endpoint exposing upstream response and prediction cache hit/miss counters"""
+    stats = api_service.cache.stats()
+    stats['predictions'] = prediction_cache.stats()
+    stats['coalesced_upstream_calls'] = api_service.flights.stats()
+    return JsonResponse(stats)
+
+def upstream_status(request):
+    """API endpoint exposing circuit breaker state for each upstream API"""
+    return JsonResponse(api_service.upstream_status())
+
 def get_crop_additional_info(crop_name, location):
     """Get additional information for a crop"""
     try: